@@ -1,4 +1,5 @@
 import asyncio
+import json
 from src import sx127x
 from src import config_lora
 from src import LoRaReceiver
@@ -8,6 +9,19 @@ from src import lcd_i2c
 
 load_dotenv()
 
+# several radios on the shared SPI bus, e.g.
+# LORA_RADIOS=[{"name": "LoRa433", "pin_ss": 25, "pin_dio0": 17},
+#              {"name": "LoRa434", "pin_ss": 7, "pin_dio0": 27, "parameters": {"frequency": 434E6},
+#               "frame_profile": "telemetry"},
+#              {"name": "LoRa868", "pin_ss": 24, "pin_dio0": 22,
+#               "cad_channels": [[868.1E6, 7], [868.1E6, 9], [868.3E6, 7]]}]
+# (a single radio on the controller's default pins when unset)
+# frame_profile: one of LoRaReceiver.FRAME_PROFILES, received in implicit header mode
+# cad_channels: [frequency, spreading_factor] channels the radio serves by CAD
+# scanning (SX127x.scan()) instead of RX continuous on its own channel
+# pin_ss 8 / 7 (CE0 / CE1): chip select driven by spidev, see controller_rpi;
+# any other pin is a GPIO chip select, which cannot be combined with CE0
+
 display_master = lcd_i2c.lcd()
 
 
@@ -16,11 +30,20 @@ async def main():
     display_master.lcd_display_string("starting...", 1)
     print("starting...")
     controller = config_lora.Controller()
-    lora = controller.add_transceiver(sx127x.SX127x(name='LoRa'),
-                                      pin_id_ss=config_lora.Controller.PIN_ID_FOR_LORA_SS,
-                                      pin_id_RxDone=config_lora.Controller.PIN_ID_FOR_LORA_DIO0)
+    radios = []
+    for radio in json.loads(os.getenv('LORA_RADIOS', '[]')) or [{}]:
+        lora = controller.add_transceiver(
+            sx127x.SX127x(name=radio.get('name', 'LoRa'),
+                          parameters=dict(sx127x.DEFAULT_PARAMETERS, **radio.get('parameters', {})),
+                          gc_policy=os.getenv('GC_POLICY'),
+                          cad_channels=radio.get('cad_channels')),
+            pin_id_ss=radio.get('pin_ss', config_lora.Controller.PIN_ID_FOR_LORA_SS),
+            pin_id_RxDone=radio.get('pin_dio0', config_lora.Controller.PIN_ID_FOR_LORA_DIO0))
+        if 'frame_profile' in radio:
+            await LoRaReceiver.set_frame_profile(lora, radio['frame_profile'])
+        radios.append(lora)
     # print('lora', lora)
-    await LoRaReceiver.receive(lora)
+    await LoRaReceiver.receive(*radios)
 
 try:
     asyncio.run(main())
@@ -1,13 +1,17 @@
 import os
 from dotenv import load_dotenv
 from . import amqp_controller
-import RPi.GPIO as GPIO
 from time import sleep
 from . import lcd_i2c
 import json
 import asyncio
 from . import ascon
+from . import decrypt_pool
+from . import gateway
+from . import adr
+from . import tx_queue
 import binascii
+from .sx127x import MAX_PKT_LENGTH
 
 load_dotenv()
 
@@ -16,38 +20,119 @@ asc = ascon.Ascon()
 rabbitmq_server = os.getenv('RABBITMQ_SERVER')
 amqp_connection = amqp_controller.AMQPConnection(rabbitmq_server)
 
+# MAC-only frames (integrity without confidentiality, e.g. heartbeats):
+# a marker byte, the plaintext message, then a 16-byte Ascon tag.
+# Encrypted frames are hex encoded, so these markers never start one.
+MAC_FRAME_VARIANTS = {ord('M'): "Ascon-Mac", ord('S'): "Ascon-PrfShort"}
+MAC_TAG_LENGTH = 16
 
-async def receive(lora):
+# decrypt in worker processes (0: decrypt inline in the receive loop)
+DECRYPT_WORKERS = int(os.getenv("DECRYPT_WORKERS", "0"))
+DECRYPT_BATCH_SIZE = int(os.getenv("DECRYPT_BATCH_SIZE", "32"))
 
-    key = os.getenv("ENCRYPT_KEY")
-    nonce = os.getenv("ENCYPT_NONCE")
+# Ascon variant of encrypted frames: ASCON_VARIANT by default, or chosen per
+# frame by a marker byte in front of the hex ciphertext. Ascon-128a has a
+# 16-byte rate, about half the permutation calls per byte, for nodes sending
+# long frames (e.g. ECG samples); constrained nodes stay on Ascon-128.
+ASCON_VARIANT = os.getenv("ASCON_VARIANT", "Ascon-128")
+VARIANT_FRAME_MARKERS = {ord('H'): "Ascon-128a", ord('L'): "Ascon-128"}
+
+# authenticated but unencrypted header shared with the nodes (Ascon associated data)
+ASSOCIATED_DATA = os.getenv("ASSOCIATED_DATA", "").encode('utf-8')
+
+# adaptive data rate: nodes are told to lower their SF / TX power when their
+# link margin allows it. Nodes are told apart by this field of their messages,
+# downlinks go through a duty-cycle limited TX queue per radio.
+ADR_ENABLED = os.getenv("ADR_ENABLED", "0") == "1"
+ADR_NODE_FIELD = os.getenv("ADR_NODE_FIELD", "id")
+TX_DUTY_CYCLE = float(os.getenv("TX_DUTY_CYCLE", "0.01"))
+adr_engines = {}
+tx_queues = {}
+
+# frame profiles: fixed-size frame types sent in implicit header mode, without
+# the LoRa header, which saves airtime on short periodic frames. A radio only
+# receives frames of its active profile's length, e.g.
+# FRAME_PROFILES={"telemetry": 97, "heartbeat": 41}; the "explicit" profile
+# (header on air, any length) always exists. Nodes pad shorter messages with
+# spaces, which json.loads ignores. FRAME_PROFILE is the profile radios start
+# with, unless master.py set one (or the radio parameters' payload_length).
+FRAME_PROFILES = dict(json.loads(os.getenv("FRAME_PROFILES", "{}")), explicit=0)
+FRAME_PROFILE = os.getenv("FRAME_PROFILE")
+frame_profiles = {}
+
+# LED blinks in progress, per radio
+blinks = {}
+
+
+async def receive(*transceivers):
+
+    # key-dependent Ascon state is computed once, not for every packet
+    key = asc.key_context(os.getenv("ENCRYPT_KEY").encode('utf-8'))
+    # one nonce chain per radio (channel)
+    nonces = {lora.name: os.getenv("ENCYPT_NONCE") for lora in transceivers}
+    mac_key = asc.key_context(
+        os.getenv("MAC_KEY", os.getenv("ENCRYPT_KEY")).encode('utf-8'))
 
     await connect_to_rabbitmq(amqp_connection)
     # print("LoRa Receiver")
     display.lcd_clear()
     display.lcd_display_string("waiting lora", 1)
     print("waiting lora")
+
+    if FRAME_PROFILE:
+        for lora in transceivers:
+            if lora.name not in frame_profiles:
+                await set_frame_profile(lora, FRAME_PROFILE)
+
+    # buffers reused for every packet, from the FIFO to the plaintext
+    payload_buffer = bytearray(MAX_PKT_LENGTH)
+    plaintext_buffer = bytearray(MAX_PKT_LENGTH // 2)
+
+    pool = None
+    if DECRYPT_WORKERS > 0:
+        pool = decrypt_pool.DecryptionPool(
+            key.key, DECRYPT_WORKERS, DECRYPT_BATCH_SIZE)
+        publisher = asyncio.create_task(publish_decrypted(pool))
     try:
-        while True:
-            if lora.receivedPacket():
-                lora.blink_led()
-                try:
-                    payload = lora.read_payload()
-                    payload_decode = payload.decode('utf-8')
-                    payload_ascii = payload_decode.encode('ascii')
-                    plaintext, nonce = decryption(
-                        asc, binascii.unhexlify(payload_ascii), key, nonce, "CBC")
-                    message = plaintext.decode("utf-8")
-                    message_json = json.loads(message)
-                    show_info(display, message_json)
-                    print("\n*** Received message ***\n{}".format(message))
-                    print("with RSSI: {}\n".format(lora.packetRssi()))
-                    await amqp_connection.send_amqp_message(payload)
-                except Exception as e:
-                    print(e)
+        # DIO0 RxDone interrupt driven, the event loop idles between packets
+        async for lora, packet in gateway.merged_packets(transceivers, payload_buffer):
+            blink(lora)
+            try:
+                payload = packet.payload
+                rssi = packet.rssi
+                link = (lora, packet.snr, packet.channel)
+                if len(payload) and payload[0] in MAC_FRAME_VARIANTS:
+                    message = authentication(
+                        asc, payload, mac_key, MAC_FRAME_VARIANTS[payload[0]])
+                    if message is None:
+                        raise Exception("authentication failed")
+                    await handle_message(message.decode("utf-8"), bytes(payload), rssi, link)
+                else:
+                    variant, ciphertext = frame_variant(payload)
+                    nonce = nonces[lora.name]
+                    if pool:
+                        # the next nonce only depends on this ciphertext, not on its decryption
+                        ciphertext = binascii.unhexlify(ciphertext)
+                        pool.submit(nonce.encode('utf-8') if isinstance(nonce, str) else nonce,
+                                    ciphertext, (bytes(payload), rssi, link), ASSOCIATED_DATA, variant)
+                        nonces[lora.name] = ciphertext[:16]
+                        continue
+                    length, nonces[lora.name] = decryption_into(
+                        asc, binascii.unhexlify(ciphertext), key, nonce, plaintext_buffer, "CBC",
+                        ASSOCIATED_DATA, variant)
+                    if length < 0:
+                        raise Exception("authentication failed")
+                    await handle_message(plaintext_buffer[:length].decode("utf-8"), bytes(payload), rssi, link)
+            except Exception as e:
+                print(e)
     except KeyboardInterrupt:
         display.lcd_clear()
         print("Keyboard interrupt detected.")
+        if pool:
+            publisher.cancel()
+            pool.close()
+        for queue in tx_queues.values():
+            queue.close()
         await amqp_connection.close()
         display.lcd_display_string("closing", 1)
         display.lcd_display_string("goodbye...", 2)
@@ -55,6 +140,95 @@ async def receive(lora):
         display.lcd_clear()
 
 
+def blink(lora):
+    # blink_led() sleeps (0.2 s on the RPi), so it runs in an executor thread
+    # and the event loop goes on servicing DIO0; one blink at a time per radio
+    future = blinks.get(lora.name)
+    if future is None or future.done():
+        blinks[lora.name] = asyncio.get_running_loop().run_in_executor(None, lora.blink_led)
+
+
+async def set_frame_profile(lora, profile):
+    # receive the frames of this profile on the radio from now on; can be
+    # called while receiving, frames of the previous profile still in the
+    # FIFO are dropped
+    if profile not in FRAME_PROFILES:
+        raise ValueError("unknown frame profile {}".format(profile))
+    await lora.set_frame_length_async(FRAME_PROFILES[profile])
+    frame_profiles[lora.name] = profile
+    print("{}: {} frames, {}".format(
+        lora.name, profile,
+        "{} bytes, implicit header".format(FRAME_PROFILES[profile]) if FRAME_PROFILES[profile] else "explicit header"))
+
+
+async def handle_message(message, payload, rssi, link=None):
+    message_json = json.loads(message)
+    if ADR_ENABLED and link and isinstance(message_json, dict):
+        adapt_data_rate(link, message_json, payload, rssi)
+    show_info(display, message_json)
+    print("\n*** Received message ***\n{}".format(message))
+    print("with RSSI: {}\n".format(rssi))
+    await amqp_connection.send_amqp_message(payload)
+
+
+async def publish_decrypted(pool):
+    # consumes the decryption pool, in the order the packets were received
+    async for (payload, rssi, link), plaintext in pool.results():
+        try:
+            if plaintext is None:
+                raise Exception("authentication failed")
+            await handle_message(plaintext.decode("utf-8"), payload, rssi, link)
+        except Exception as e:
+            print(e)
+
+
+def adapt_data_rate(link, message_json, payload, rssi):
+    # feed the node's link quality to the ADR engine of the radio that heard
+    # it, and queue a downlink when it recommends new settings. A radio
+    # scanning CAD channels has one engine per frequency, limited to the
+    # spreading factors scanned on it.
+    lora, snr, channel = link
+    node_id = message_json.get(ADR_NODE_FIELD)
+    if node_id is None:
+        return
+    frequency, spreading_factor = channel or (lora.parameters['frequency'], None)
+    engine = adr_engines.get((lora.name, frequency))
+    if engine is None:
+        if channel:
+            spreading_factors = [sf for f, sf in lora.cad_channels if f == frequency]
+            engine = adr.AdrEngine(dict(lora.parameters, frequency=frequency,
+                                        spreading_factor=spreading_factor),
+                                   spreading_factors=spreading_factors)
+        else:
+            engine = adr.AdrEngine(lora.parameters)
+        adr_engines[lora.name, frequency] = engine
+    recommendation = engine.update(node_id, snr, rssi, len(payload), spreading_factor)
+    if recommendation is None:
+        return
+
+    queue = tx_queues.get(lora.name)
+    if queue is None:
+        queue = tx_queues[lora.name] = tx_queue.TransmitQueue(lora, TX_DUTY_CYCLE)
+    command = engine.command(recommendation)
+    print("ADR {}: SF{} {}dBm, margin {}dB, {:.0f}ms -> {:.0f}ms on air".format(
+        node_id, recommendation['spreading_factor'], recommendation['tx_power_level'],
+        recommendation['margin'], recommendation['previous_airtime'] * 1000,
+        recommendation['airtime'] * 1000))
+
+    def sent(future):
+        # the node only switches once it heard the command
+        if not future.cancelled() and future.exception() is None:
+            engine.applied(node_id, recommendation)
+            return
+        if not future.cancelled():
+            print(future.exception())
+        engine.failed(node_id)
+
+    engine.sending(node_id, recommendation)
+    # on the channel the node was heard on, a scanning radio may be elsewhere
+    queue.send(command, channel=channel).add_done_callback(sent)
+
+
 async def connect_to_rabbitmq(amqp_connection):
     while True:
         try:
@@ -90,14 +264,51 @@ def get_formatted_date(date_tuple):
     return f"{date_tuple[0]:04d}-{date_tuple[1]:02d}-{date_tuple[2]:02d} {date_tuple[4]:02d}:{date_tuple[5]:02d}"
 
 
-def decryption(ascon, ciphertext, key, nonce, mode="ECB"):
-    key_bytes = key.encode('utf-8')
+def frame_variant(payload):
+    # returns the Ascon variant of an encrypted frame and its hex ciphertext
+    if len(payload) and payload[0] in VARIANT_FRAME_MARKERS:
+        return VARIANT_FRAME_MARKERS[payload[0]], payload[1:]
+    return ASCON_VARIANT, payload
+
+
+def decryption(ascon, ciphertext, key, nonce, mode="ECB", associateddata=b"", variant="Ascon-128"):
+    # key may be a str, bytes or an ascon.KeyContext
+    if isinstance(key, str):
+        key = key.encode('utf-8')
+    key_context = ascon.key_context(key)
     if not isinstance(nonce, bytes):
         nonce = nonce.encode('utf-8')
     # print(f"key: {key_bytes} len: {len(key_bytes)}")
     # print(f"nonce: {nonce} len: {len(nonce)}")
     plaintext = ascon.ascon_decrypt(
-        key_bytes, nonce, associateddata="", ciphertext=ciphertext,  variant="Ascon-128")
+        key_context, nonce, associateddata=associateddata, ciphertext=ciphertext,  variant=variant)
     if mode == "CBC":
         new_nonce = ciphertext[:16]
     return plaintext, new_nonce
+
+
+def decryption_into(ascon, ciphertext, key, nonce, out, mode="ECB", associateddata=b"", variant="Ascon-128"):
+    # like decryption(), but writes the plaintext into out and returns its
+    # length (-1 if authentication fails) instead of a new bytes object
+    if isinstance(key, str):
+        key = key.encode('utf-8')
+    if not isinstance(nonce, bytes):
+        nonce = nonce.encode('utf-8')
+    length = ascon.ascon_decrypt_into(
+        ascon.key_context(key), nonce, memoryview(ciphertext), out, variant=variant,
+        associateddata=associateddata)
+    if mode == "CBC":
+        nonce = bytes(ciphertext[:16])
+    return length, nonce
+
+
+def authentication(ascon, frame, key, variant="Ascon-Mac"):
+    # MAC-only frame: returns the message if the tag verifies, None otherwise
+    if len(frame) < 1 + MAC_TAG_LENGTH:
+        return None
+    message = bytes(frame[1:-MAC_TAG_LENGTH])
+    if variant == "Ascon-PrfShort" and len(message) > 16:
+        return None
+    if ascon.ascon_mac_verify(key, message, frame[-MAC_TAG_LENGTH:], variant):
+        return message
+    return None
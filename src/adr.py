@@ -0,0 +1,156 @@
+import json
+from collections import deque
+from .sx127x import DEFAULT_PARAMETERS, time_on_air
+
+
+# Gateway side adaptive data rate: per node rolling SNR / RSSI statistics,
+# and a recommendation of spreading factor and TX power from the link margin,
+# following the LoRaWAN ADR scheme. Every 3 dB of margin above the SNR the
+# demodulator needs (plus an installation margin) lowers the SF by one, each
+# SF step roughly halving the time on air; once at the lowest SF the TX power
+# is lowered instead. A negative margin raises the power first, then the SF.
+# Only the spreading factors the gateway receives are recommended: an SX127x
+# demodulates its configured SF only, a node moved to another goes unheard.
+
+# SNR limit of the demodulator per spreading factor (SX1276 datasheet)
+REQUIRED_SNR = {6: -5.0, 7: -7.5, 8: -10.0, 9: -12.5, 10: -15.0, 11: -17.5, 12: -20.0}
+MIN_SPREADING_FACTOR = 7
+MAX_SPREADING_FACTOR = 12
+MARGIN_STEP = 3     # dB per ADR step
+TX_POWER_STEP = 3   # dB
+
+
+class NodeLink:
+
+    # rolling link statistics of one node, and the settings it is assumed to use
+
+    def __init__(self, spreading_factor, tx_power, history):
+        self.spreading_factor = spreading_factor
+        self.tx_power = tx_power
+        self.snr = deque(maxlen=history)
+        self.rssi = deque(maxlen=history)
+        self.payload_length = 0
+        # recommendation sent to the node, not acknowledged by TX_DONE yet
+        self.pending = None
+
+    def add(self, snr, rssi, payload_length):
+        self.snr.append(snr)
+        self.rssi.append(rssi)
+        self.payload_length = max(self.payload_length, payload_length)
+
+    def max_snr(self):
+        return max(self.snr)
+
+    def mean_rssi(self):
+        return sum(self.rssi) / len(self.rssi)
+
+
+class AdrEngine:
+
+    def __init__(self, parameters=DEFAULT_PARAMETERS, history=20, installation_margin=10,
+                 min_tx_power=2, max_tx_power=17, spreading_factors=None):
+        # parameters: the modem settings the nodes start with (the gateway radio's)
+        # spreading_factors: the ones the gateway receives, default the radio's
+        self.parameters = parameters
+        if spreading_factors is None:
+            spreading_factors = (parameters['spreading_factor'],)
+        self.spreading_factors = sorted(
+            sf for sf in set(spreading_factors) if MIN_SPREADING_FACTOR <= sf <= MAX_SPREADING_FACTOR)
+        self.history = history
+        self.installation_margin = installation_margin
+        self.min_tx_power = min_tx_power
+        self.max_tx_power = max_tx_power
+        self.nodes = {}
+
+    def node(self, node_id):
+        link = self.nodes.get(node_id)
+        if link is None:
+            link = self.nodes[node_id] = NodeLink(
+                self.parameters['spreading_factor'], self.parameters['tx_power_level'], self.history)
+        return link
+
+    def time_on_air(self, payload_length, spreading_factor):
+        return time_on_air(payload_length, dict(self.parameters, spreading_factor=spreading_factor))
+
+    def link_margin(self, node_id):
+        # dB above what the node's current SF needs, None until history is full
+        link = self.nodes.get(node_id)
+        if link is None or len(link.snr) < self.history:
+            return None
+        return link.max_snr() - REQUIRED_SNR[link.spreading_factor] - self.installation_margin
+
+    def update(self, node_id, snr, rssi, payload_length, spreading_factor=None):
+        # record one uplink, returns a recommendation dict (see recommend) or None;
+        # spreading_factor: the one it was received on, when known (CAD scanning)
+        if snr is None:
+            return None
+        link = self.node(node_id)
+        if spreading_factor is not None and spreading_factor != link.spreading_factor:
+            # the node is on another SF than assumed, its statistics do not apply
+            link.spreading_factor = spreading_factor
+            link.snr.clear()
+            link.rssi.clear()
+        link.add(snr, rssi, payload_length)
+        if link.pending is not None:
+            return None
+        return self.recommend(node_id)
+
+    def recommend(self, node_id):
+        # new spreading factor / TX power for the node, None when unchanged
+        margin = self.link_margin(node_id)
+        if margin is None:
+            return None
+        link = self.nodes[node_id]
+        sf = link.spreading_factor
+        tx_power = link.tx_power
+
+        # one step per SF, skipping the ones the gateway does not receive
+        steps = int(margin // MARGIN_STEP)
+        lower = [s for s in self.spreading_factors if s < sf]
+        while steps > 0 and lower and sf - lower[-1] <= steps:
+            steps -= sf - lower[-1]
+            sf = lower.pop()
+        while steps > 0 and tx_power > self.min_tx_power:
+            tx_power = max(tx_power - TX_POWER_STEP, self.min_tx_power)
+            steps -= 1
+        while steps < 0 and tx_power < self.max_tx_power:
+            tx_power = min(tx_power + TX_POWER_STEP, self.max_tx_power)
+            steps += 1
+        higher = [s for s in self.spreading_factors if s > sf]
+        while steps < 0 and higher:
+            steps += higher[0] - sf
+            sf = higher.pop(0)
+
+        if sf == link.spreading_factor and tx_power == link.tx_power:
+            return None
+        return {'node': node_id,
+                'spreading_factor': sf,
+                'tx_power_level': tx_power,
+                'margin': round(margin, 1),
+                'airtime': self.time_on_air(link.payload_length, sf),
+                'previous_airtime': self.time_on_air(link.payload_length, link.spreading_factor)}
+
+    def sending(self, node_id, recommendation):
+        # the downlink is queued, no new recommendation until it is sent
+        self.nodes[node_id].pending = recommendation
+
+    def failed(self, node_id):
+        # the downlink was not sent, the node keeps its settings
+        self.nodes[node_id].pending = None
+
+    def applied(self, node_id, recommendation):
+        # the node was told to switch, start its statistics over at the new settings
+        link = self.nodes[node_id]
+        link.pending = None
+        link.spreading_factor = recommendation['spreading_factor']
+        link.tx_power = recommendation['tx_power_level']
+        link.snr.clear()
+        link.rssi.clear()
+
+    def command(self, recommendation):
+        # the downlink sent to the node, a JSON text frame like the uplinks
+        return json.dumps({'cmd': 'adr',
+                           'id': recommendation['node'],
+                           'sf': recommendation['spreading_factor'],
+                           'txp': recommendation['tx_power_level']},
+                          separators=(',', ':'))
@@ -5,17 +5,461 @@ Implementation of Ascon v1.2, an authenticated cipher and hash function
 http://ascon.iaik.tugraz.at/
 """
 
+from collections import OrderedDict
+import hmac
+import struct
+
+try:
+    import numpy as np
+except ImportError:
+    # batch decryption falls back to one packet at a time
+    np = None
+
+
+# === Ascon permutation, fast engine ===
+
+M64 = 0xFFFFFFFFFFFFFFFF
+
+# round constant of round r is 0xf0 - r*0x10 + r*0x1 (r = 0..11)
+ROUND_CONSTANTS = (0xf0, 0xe1, 0xd2, 0xc3, 0xb4, 0xa5,
+                   0x96, 0x87, 0x78, 0x69, 0x5a, 0x4b)
+
+# The three round counts used by the AEAD modes (p^6, p^8, p^12) are fully
+# unrolled with the state held in locals and the rotations inlined. Rounds are
+# shared: p^12 runs rounds 0-3 and continues in p^8, which runs rounds 4-5 and
+# continues in p^6.
+
+
+def ascon_p6(x0, x1, x2, x3, x4):
+    """
+    Ascon permutation p^6 on the five state words, returns the new state.
+    """
+    # round 6
+    x2 ^= x1 ^ 0x96
+    x0 ^= x4
+    x4 ^= x3
+    t0 = x0 ^ (~x1 & x2)
+    t1 = x1 ^ (~x2 & x3)
+    t2 = x2 ^ (~x3 & x4)
+    t3 = x3 ^ (~x4 & x0)
+    t4 = x4 ^ (~x0 & x1)
+    t1 ^= t0
+    t0 ^= t4
+    t3 ^= t2
+    x0 = (t0 ^ (t0 >> 19) ^ (t0 << 45) ^ (t0 >> 28) ^ (t0 << 36)) & M64
+    x1 = (t1 ^ (t1 >> 61) ^ (t1 << 3) ^ (t1 >> 39) ^ (t1 << 25)) & M64
+    x2 = ~(t2 ^ (t2 >> 1) ^ (t2 << 63) ^ (t2 >> 6) ^ (t2 << 58)) & M64
+    x3 = (t3 ^ (t3 >> 10) ^ (t3 << 54) ^ (t3 >> 17) ^ (t3 << 47)) & M64
+    x4 = (t4 ^ (t4 >> 7) ^ (t4 << 57) ^ (t4 >> 41) ^ (t4 << 23)) & M64
+    # round 7
+    x2 ^= x1 ^ 0x87
+    x0 ^= x4
+    x4 ^= x3
+    t0 = x0 ^ (~x1 & x2)
+    t1 = x1 ^ (~x2 & x3)
+    t2 = x2 ^ (~x3 & x4)
+    t3 = x3 ^ (~x4 & x0)
+    t4 = x4 ^ (~x0 & x1)
+    t1 ^= t0
+    t0 ^= t4
+    t3 ^= t2
+    x0 = (t0 ^ (t0 >> 19) ^ (t0 << 45) ^ (t0 >> 28) ^ (t0 << 36)) & M64
+    x1 = (t1 ^ (t1 >> 61) ^ (t1 << 3) ^ (t1 >> 39) ^ (t1 << 25)) & M64
+    x2 = ~(t2 ^ (t2 >> 1) ^ (t2 << 63) ^ (t2 >> 6) ^ (t2 << 58)) & M64
+    x3 = (t3 ^ (t3 >> 10) ^ (t3 << 54) ^ (t3 >> 17) ^ (t3 << 47)) & M64
+    x4 = (t4 ^ (t4 >> 7) ^ (t4 << 57) ^ (t4 >> 41) ^ (t4 << 23)) & M64
+    # round 8
+    x2 ^= x1 ^ 0x78
+    x0 ^= x4
+    x4 ^= x3
+    t0 = x0 ^ (~x1 & x2)
+    t1 = x1 ^ (~x2 & x3)
+    t2 = x2 ^ (~x3 & x4)
+    t3 = x3 ^ (~x4 & x0)
+    t4 = x4 ^ (~x0 & x1)
+    t1 ^= t0
+    t0 ^= t4
+    t3 ^= t2
+    x0 = (t0 ^ (t0 >> 19) ^ (t0 << 45) ^ (t0 >> 28) ^ (t0 << 36)) & M64
+    x1 = (t1 ^ (t1 >> 61) ^ (t1 << 3) ^ (t1 >> 39) ^ (t1 << 25)) & M64
+    x2 = ~(t2 ^ (t2 >> 1) ^ (t2 << 63) ^ (t2 >> 6) ^ (t2 << 58)) & M64
+    x3 = (t3 ^ (t3 >> 10) ^ (t3 << 54) ^ (t3 >> 17) ^ (t3 << 47)) & M64
+    x4 = (t4 ^ (t4 >> 7) ^ (t4 << 57) ^ (t4 >> 41) ^ (t4 << 23)) & M64
+    # round 9
+    x2 ^= x1 ^ 0x69
+    x0 ^= x4
+    x4 ^= x3
+    t0 = x0 ^ (~x1 & x2)
+    t1 = x1 ^ (~x2 & x3)
+    t2 = x2 ^ (~x3 & x4)
+    t3 = x3 ^ (~x4 & x0)
+    t4 = x4 ^ (~x0 & x1)
+    t1 ^= t0
+    t0 ^= t4
+    t3 ^= t2
+    x0 = (t0 ^ (t0 >> 19) ^ (t0 << 45) ^ (t0 >> 28) ^ (t0 << 36)) & M64
+    x1 = (t1 ^ (t1 >> 61) ^ (t1 << 3) ^ (t1 >> 39) ^ (t1 << 25)) & M64
+    x2 = ~(t2 ^ (t2 >> 1) ^ (t2 << 63) ^ (t2 >> 6) ^ (t2 << 58)) & M64
+    x3 = (t3 ^ (t3 >> 10) ^ (t3 << 54) ^ (t3 >> 17) ^ (t3 << 47)) & M64
+    x4 = (t4 ^ (t4 >> 7) ^ (t4 << 57) ^ (t4 >> 41) ^ (t4 << 23)) & M64
+    # round 10
+    x2 ^= x1 ^ 0x5a
+    x0 ^= x4
+    x4 ^= x3
+    t0 = x0 ^ (~x1 & x2)
+    t1 = x1 ^ (~x2 & x3)
+    t2 = x2 ^ (~x3 & x4)
+    t3 = x3 ^ (~x4 & x0)
+    t4 = x4 ^ (~x0 & x1)
+    t1 ^= t0
+    t0 ^= t4
+    t3 ^= t2
+    x0 = (t0 ^ (t0 >> 19) ^ (t0 << 45) ^ (t0 >> 28) ^ (t0 << 36)) & M64
+    x1 = (t1 ^ (t1 >> 61) ^ (t1 << 3) ^ (t1 >> 39) ^ (t1 << 25)) & M64
+    x2 = ~(t2 ^ (t2 >> 1) ^ (t2 << 63) ^ (t2 >> 6) ^ (t2 << 58)) & M64
+    x3 = (t3 ^ (t3 >> 10) ^ (t3 << 54) ^ (t3 >> 17) ^ (t3 << 47)) & M64
+    x4 = (t4 ^ (t4 >> 7) ^ (t4 << 57) ^ (t4 >> 41) ^ (t4 << 23)) & M64
+    # round 11
+    x2 ^= x1 ^ 0x4b
+    x0 ^= x4
+    x4 ^= x3
+    t0 = x0 ^ (~x1 & x2)
+    t1 = x1 ^ (~x2 & x3)
+    t2 = x2 ^ (~x3 & x4)
+    t3 = x3 ^ (~x4 & x0)
+    t4 = x4 ^ (~x0 & x1)
+    t1 ^= t0
+    t0 ^= t4
+    t3 ^= t2
+    x0 = (t0 ^ (t0 >> 19) ^ (t0 << 45) ^ (t0 >> 28) ^ (t0 << 36)) & M64
+    x1 = (t1 ^ (t1 >> 61) ^ (t1 << 3) ^ (t1 >> 39) ^ (t1 << 25)) & M64
+    x2 = ~(t2 ^ (t2 >> 1) ^ (t2 << 63) ^ (t2 >> 6) ^ (t2 << 58)) & M64
+    x3 = (t3 ^ (t3 >> 10) ^ (t3 << 54) ^ (t3 >> 17) ^ (t3 << 47)) & M64
+    x4 = (t4 ^ (t4 >> 7) ^ (t4 << 57) ^ (t4 >> 41) ^ (t4 << 23)) & M64
+    return x0, x1, x2, x3, x4
+
+
+def ascon_p8(x0, x1, x2, x3, x4):
+    """
+    Ascon permutation p^8 on the five state words, returns the new state.
+    """
+    # round 4
+    x2 ^= x1 ^ 0xb4
+    x0 ^= x4
+    x4 ^= x3
+    t0 = x0 ^ (~x1 & x2)
+    t1 = x1 ^ (~x2 & x3)
+    t2 = x2 ^ (~x3 & x4)
+    t3 = x3 ^ (~x4 & x0)
+    t4 = x4 ^ (~x0 & x1)
+    t1 ^= t0
+    t0 ^= t4
+    t3 ^= t2
+    x0 = (t0 ^ (t0 >> 19) ^ (t0 << 45) ^ (t0 >> 28) ^ (t0 << 36)) & M64
+    x1 = (t1 ^ (t1 >> 61) ^ (t1 << 3) ^ (t1 >> 39) ^ (t1 << 25)) & M64
+    x2 = ~(t2 ^ (t2 >> 1) ^ (t2 << 63) ^ (t2 >> 6) ^ (t2 << 58)) & M64
+    x3 = (t3 ^ (t3 >> 10) ^ (t3 << 54) ^ (t3 >> 17) ^ (t3 << 47)) & M64
+    x4 = (t4 ^ (t4 >> 7) ^ (t4 << 57) ^ (t4 >> 41) ^ (t4 << 23)) & M64
+    # round 5
+    x2 ^= x1 ^ 0xa5
+    x0 ^= x4
+    x4 ^= x3
+    t0 = x0 ^ (~x1 & x2)
+    t1 = x1 ^ (~x2 & x3)
+    t2 = x2 ^ (~x3 & x4)
+    t3 = x3 ^ (~x4 & x0)
+    t4 = x4 ^ (~x0 & x1)
+    t1 ^= t0
+    t0 ^= t4
+    t3 ^= t2
+    x0 = (t0 ^ (t0 >> 19) ^ (t0 << 45) ^ (t0 >> 28) ^ (t0 << 36)) & M64
+    x1 = (t1 ^ (t1 >> 61) ^ (t1 << 3) ^ (t1 >> 39) ^ (t1 << 25)) & M64
+    x2 = ~(t2 ^ (t2 >> 1) ^ (t2 << 63) ^ (t2 >> 6) ^ (t2 << 58)) & M64
+    x3 = (t3 ^ (t3 >> 10) ^ (t3 << 54) ^ (t3 >> 17) ^ (t3 << 47)) & M64
+    x4 = (t4 ^ (t4 >> 7) ^ (t4 << 57) ^ (t4 >> 41) ^ (t4 << 23)) & M64
+    return ascon_p6(x0, x1, x2, x3, x4)
+
+
+def ascon_p12(x0, x1, x2, x3, x4):
+    """
+    Ascon permutation p^12 on the five state words, returns the new state.
+    """
+    # round 0
+    x2 ^= x1 ^ 0xf0
+    x0 ^= x4
+    x4 ^= x3
+    t0 = x0 ^ (~x1 & x2)
+    t1 = x1 ^ (~x2 & x3)
+    t2 = x2 ^ (~x3 & x4)
+    t3 = x3 ^ (~x4 & x0)
+    t4 = x4 ^ (~x0 & x1)
+    t1 ^= t0
+    t0 ^= t4
+    t3 ^= t2
+    x0 = (t0 ^ (t0 >> 19) ^ (t0 << 45) ^ (t0 >> 28) ^ (t0 << 36)) & M64
+    x1 = (t1 ^ (t1 >> 61) ^ (t1 << 3) ^ (t1 >> 39) ^ (t1 << 25)) & M64
+    x2 = ~(t2 ^ (t2 >> 1) ^ (t2 << 63) ^ (t2 >> 6) ^ (t2 << 58)) & M64
+    x3 = (t3 ^ (t3 >> 10) ^ (t3 << 54) ^ (t3 >> 17) ^ (t3 << 47)) & M64
+    x4 = (t4 ^ (t4 >> 7) ^ (t4 << 57) ^ (t4 >> 41) ^ (t4 << 23)) & M64
+    # round 1
+    x2 ^= x1 ^ 0xe1
+    x0 ^= x4
+    x4 ^= x3
+    t0 = x0 ^ (~x1 & x2)
+    t1 = x1 ^ (~x2 & x3)
+    t2 = x2 ^ (~x3 & x4)
+    t3 = x3 ^ (~x4 & x0)
+    t4 = x4 ^ (~x0 & x1)
+    t1 ^= t0
+    t0 ^= t4
+    t3 ^= t2
+    x0 = (t0 ^ (t0 >> 19) ^ (t0 << 45) ^ (t0 >> 28) ^ (t0 << 36)) & M64
+    x1 = (t1 ^ (t1 >> 61) ^ (t1 << 3) ^ (t1 >> 39) ^ (t1 << 25)) & M64
+    x2 = ~(t2 ^ (t2 >> 1) ^ (t2 << 63) ^ (t2 >> 6) ^ (t2 << 58)) & M64
+    x3 = (t3 ^ (t3 >> 10) ^ (t3 << 54) ^ (t3 >> 17) ^ (t3 << 47)) & M64
+    x4 = (t4 ^ (t4 >> 7) ^ (t4 << 57) ^ (t4 >> 41) ^ (t4 << 23)) & M64
+    # round 2
+    x2 ^= x1 ^ 0xd2
+    x0 ^= x4
+    x4 ^= x3
+    t0 = x0 ^ (~x1 & x2)
+    t1 = x1 ^ (~x2 & x3)
+    t2 = x2 ^ (~x3 & x4)
+    t3 = x3 ^ (~x4 & x0)
+    t4 = x4 ^ (~x0 & x1)
+    t1 ^= t0
+    t0 ^= t4
+    t3 ^= t2
+    x0 = (t0 ^ (t0 >> 19) ^ (t0 << 45) ^ (t0 >> 28) ^ (t0 << 36)) & M64
+    x1 = (t1 ^ (t1 >> 61) ^ (t1 << 3) ^ (t1 >> 39) ^ (t1 << 25)) & M64
+    x2 = ~(t2 ^ (t2 >> 1) ^ (t2 << 63) ^ (t2 >> 6) ^ (t2 << 58)) & M64
+    x3 = (t3 ^ (t3 >> 10) ^ (t3 << 54) ^ (t3 >> 17) ^ (t3 << 47)) & M64
+    x4 = (t4 ^ (t4 >> 7) ^ (t4 << 57) ^ (t4 >> 41) ^ (t4 << 23)) & M64
+    # round 3
+    x2 ^= x1 ^ 0xc3
+    x0 ^= x4
+    x4 ^= x3
+    t0 = x0 ^ (~x1 & x2)
+    t1 = x1 ^ (~x2 & x3)
+    t2 = x2 ^ (~x3 & x4)
+    t3 = x3 ^ (~x4 & x0)
+    t4 = x4 ^ (~x0 & x1)
+    t1 ^= t0
+    t0 ^= t4
+    t3 ^= t2
+    x0 = (t0 ^ (t0 >> 19) ^ (t0 << 45) ^ (t0 >> 28) ^ (t0 << 36)) & M64
+    x1 = (t1 ^ (t1 >> 61) ^ (t1 << 3) ^ (t1 >> 39) ^ (t1 << 25)) & M64
+    x2 = ~(t2 ^ (t2 >> 1) ^ (t2 << 63) ^ (t2 >> 6) ^ (t2 << 58)) & M64
+    x3 = (t3 ^ (t3 >> 10) ^ (t3 << 54) ^ (t3 >> 17) ^ (t3 << 47)) & M64
+    x4 = (t4 ^ (t4 >> 7) ^ (t4 << 57) ^ (t4 >> 41) ^ (t4 << 23)) & M64
+    return ascon_p8(x0, x1, x2, x3, x4)
+
+
+def ascon_p_rounds(x0, x1, x2, x3, x4, rounds):
+    """
+    Generic fast permutation for round counts without an unrolled variant.
+    """
+    for c in ROUND_CONSTANTS[12-rounds:]:
+        x2 ^= x1 ^ c
+        x0 ^= x4
+        x4 ^= x3
+        t0 = x0 ^ (~x1 & x2)
+        t1 = x1 ^ (~x2 & x3)
+        t2 = x2 ^ (~x3 & x4)
+        t3 = x3 ^ (~x4 & x0)
+        t4 = x4 ^ (~x0 & x1)
+        t1 ^= t0
+        t0 ^= t4
+        t3 ^= t2
+        x0 = (t0 ^ (t0 >> 19) ^ (t0 << 45) ^ (t0 >> 28) ^ (t0 << 36)) & M64
+        x1 = (t1 ^ (t1 >> 61) ^ (t1 << 3) ^ (t1 >> 39) ^ (t1 << 25)) & M64
+        x2 = ~(t2 ^ (t2 >> 1) ^ (t2 << 63) ^ (t2 >> 6) ^ (t2 << 58)) & M64
+        x3 = (t3 ^ (t3 >> 10) ^ (t3 << 54) ^ (t3 >> 17) ^ (t3 << 47)) & M64
+        x4 = (t4 ^ (t4 >> 7) ^ (t4 << 57) ^ (t4 >> 41) ^ (t4 << 23)) & M64
+    return x0, x1, x2, x3, x4
+
+
+UNROLLED_PERMUTATIONS = {6: ascon_p6, 8: ascon_p8, 12: ascon_p12}
+
+# big-endian state words read from / written to buffers in place
+WORD = struct.Struct(">Q")
+TWO_WORDS = struct.Struct(">QQ")
+
+# ascon_decrypt_many: smaller groups are decrypted one by one, below about
+# 16 lanes the NumPy setup costs more than the scalar permutations
+MIN_LANES = 16
+
+
+def decrypt_last_word(x, src, offset, n, out):
+    """
+    Decrypts the n (0..7) ciphertext bytes at src[offset:] that end the last
+    block into out[offset:], returns the new state word including the padding.
+    """
+    c = int.from_bytes(src[offset:offset+n], "big") << (64 - 8*n)
+    out[offset:offset+n] = ((x ^ c) >> (64 - 8*n)).to_bytes(n, "big")
+    return c ^ (x & (M64 >> 8*n)) ^ (0x80 << (56 - 8*n))
+
+
+if np is not None:
+    # last ciphertext block of a lane, per state word, indexed by
+    # clip(lastlen - 8*word, -1, 8) + 1: word untouched, 0..7 ciphertext
+    # bytes followed by the 0x80 padding byte, or fully replaced
+    LAST_BLOCK_KEEP = np.array([M64] + [M64 >> (8*i) for i in range(8)] + [0],
+                               dtype=np.uint64)
+    LAST_BLOCK_PADDING = np.array([0] + [0x80 << (56 - 8*i) for i in range(8)] + [0],
+                                  dtype=np.uint64)
+
+
+def ascon_permutation_lanes(S, rounds):
+    """
+    Ascon permutation on NumPy lanes, one uint64 array element per packet.
+    S: Ascon state, a list of 5 uint64 arrays of equal length
+    rounds: number of rounds to perform
+    returns nothing, updates S
+    """
+    x0, x1, x2, x3, x4 = S
+    for c in ROUND_CONSTANTS[12-rounds:]:
+        x2 = x2 ^ x1 ^ np.uint64(c)
+        x0 = x0 ^ x4
+        x4 = x4 ^ x3
+        t0 = x0 ^ (~x1 & x2)
+        t1 = x1 ^ (~x2 & x3)
+        t2 = x2 ^ (~x3 & x4)
+        t3 = x3 ^ (~x4 & x0)
+        t4 = x4 ^ (~x0 & x1)
+        t1 ^= t0
+        t0 ^= t4
+        t3 ^= t2
+        x0 = t0 ^ ((t0 >> 19) | (t0 << 45)) ^ ((t0 >> 28) | (t0 << 36))
+        x1 = t1 ^ ((t1 >> 61) | (t1 << 3)) ^ ((t1 >> 39) | (t1 << 25))
+        x2 = ~(t2 ^ ((t2 >> 1) | (t2 << 63)) ^ ((t2 >> 6) | (t2 << 58)))
+        x3 = t3 ^ ((t3 >> 10) | (t3 << 54)) ^ ((t3 >> 17) | (t3 << 47))
+        x4 = t4 ^ ((t4 >> 7) | (t4 << 57)) ^ ((t4 >> 41) | (t4 << 23))
+    S[0], S[1], S[2], S[3], S[4] = x0, x1, x2, x3, x4
+
+
+class KeyContext:
+    """
+    Key-dependent part of Ascon, computed once per key.
+    key: a bytes object of size 16 (for Ascon-128, Ascon-128a) or 20 (for Ascon-80pq)
+    Holds the state words the key contributes to initialization and finalization,
+    so encryption and decryption don't have to rebuild them for every packet.
+    """
+
+    def __init__(self, key):
+        assert (len(key) in [16, 20])
+        self.key = bytes(key)
+        self.k = len(key) * 8  # bits
+
+        # xored into the state after the initialization permutation
+        zero_key = bytes(40 - len(key)) + self.key
+        self.zero_key = tuple(int.from_bytes(zero_key[8*w:8*(w+1)], "big")
+                              for w in range(5))
+
+        # xored into the state before and after the finalization permutation
+        key_padded = self.key + bytes(24 - len(key))
+        self.finalize_key = tuple(int.from_bytes(key_padded[8*w:8*(w+1)], "big")
+                                  for w in range(3))
+        self.tag_key = (int.from_bytes(self.key[-16:-8], "big"),
+                        int.from_bytes(self.key[-8:], "big"))
+
+        self._initial_words = {}
+        self._mac_states = {}
+
+    def initial_words(self, rate, a, b):
+        """
+        Returns the first three words of the initial state (IV, zero padding and
+        key), which only depend on the key and the variant parameters.
+        """
+        words = self._initial_words.get((rate, a, b))
+        if words is None:
+            iv_zero_key = bytes([self.k, rate * 8, a, b] +
+                                (20-len(self.key))*[0]) + self.key
+            words = tuple(int.from_bytes(iv_zero_key[8*w:8*(w+1)], "big")
+                          for w in range(3))
+            self._initial_words[(rate, a, b)] = words
+        return words
+
+    def mac_state(self, ascon, variant):
+        """
+        Returns the Ascon-Mac / Ascon-Prf state after the initialization
+        permutation, which only depends on the key and the variant.
+        """
+        state = self._mac_states.get(variant)
+        if state is None:
+            a = 12  # rounds
+            b = 12  # rounds
+            S = ascon.bytes_to_state(ascon.to_bytes([self.k, 16 * 8, a + 128, a - b]) +
+                                     ascon.int_to_bytes(128 if variant == "Ascon-Mac" else 0, 4) +
+                                     self.key + ascon.zero_bytes(16))
+            if ascon.debug:
+                ascon.printstate(S, "initial value:")
+            ascon.ascon_permutation(S, a)
+            state = tuple(S)
+            self._mac_states[variant] = state
+        return state
+
 
 class Ascon:
-    def __init__(self, debug=False, debugpermutation=False):
+    def __init__(self, debug=False, debugpermutation=False, key_cache_size=32, ad_cache_size=32):
         self.debug = debug
         self.debugpermutation = debugpermutation
+        # LRU cache of KeyContext objects, keyed by key bytes
+        self.key_cache_size = key_cache_size
+        self.key_contexts = OrderedDict()
+        # LRU cache of padded associated data blocks, keyed by (associated data, rate)
+        self.ad_cache_size = ad_cache_size
+        self.ad_blocks = OrderedDict()
+
+    def key_context(self, key):
+        """
+        Returns the KeyContext for key, built once and kept in a bounded LRU cache.
+        key: a bytes object of size 16 or 20, or a KeyContext (returned unchanged)
+        """
+        if isinstance(key, KeyContext):
+            return key
+        key = bytes(key)
+        context = self.key_contexts.get(key)
+        if context is None:
+            context = KeyContext(key)
+            self.key_contexts[key] = context
+            if len(self.key_contexts) > self.key_cache_size:
+                self.key_contexts.popitem(last=False)
+        else:
+            self.key_contexts.move_to_end(key)
+        return context
+
+    def associated_data_blocks(self, associateddata, rate):
+        """
+        Returns the padded associated data as a tuple of blocks, each a tuple of
+        rate/8 state words, kept in a bounded LRU cache.
+        The sponge state after absorbing the associated data depends on the
+        nonce, so it can't be cached; fixed headers (e.g. per node) still skip
+        the padding and byte conversion on every packet.
+        associateddata: a bytes-like object of arbitrary length
+        rate: block size in bytes (8 for Ascon-128, Ascon-80pq; 16 for Ascon-128a)
+        """
+        cache_key = (bytes(associateddata), rate)
+        blocks = self.ad_blocks.get(cache_key)
+        if blocks is None:
+            a_zeros = rate - (len(associateddata) % rate) - 1
+            a_padded = cache_key[0] + b"\x80" + self.zero_bytes(a_zeros)
+            blocks = tuple(tuple(self.bytes_to_int(a_padded[block+w:block+w+8])
+                                 for w in range(0, rate, 8))
+                           for block in range(0, len(a_padded), rate))
+            self.ad_blocks[cache_key] = blocks
+            if len(self.ad_blocks) > self.ad_cache_size:
+                self.ad_blocks.popitem(last=False)
+        else:
+            self.ad_blocks.move_to_end(cache_key)
+        return blocks
+
     # === Ascon AEAD encryption and decryption ===
 
     def ascon_encrypt(self, key, nonce, associateddata, plaintext, variant="Ascon-128"):
         """
         Ascon encryption.
-        key: a bytes object of size 16 (for Ascon-128, Ascon-128a; 128-bit security) or 20 (for Ascon-80pq; 128-bit security)
+        key: a bytes object of size 16 (for Ascon-128, Ascon-128a; 128-bit security) or 20 (for Ascon-80pq; 128-bit security), or its KeyContext
         nonce: a bytes object of size 16 (must not repeat for the same key!)
         associateddata: a bytes object of arbitrary length
         plaintext: a bytes object of arbitrary length
@@ -23,18 +467,19 @@ class Ascon:
         returns a bytes object of length len(plaintext)+16 containing the ciphertext and tag
         """
         assert variant in ["Ascon-128", "Ascon-128a", "Ascon-80pq"]
+        key = self.key_context(key)
         if variant in ["Ascon-128", "Ascon-128a"]:
-            assert (len(key) == 16 and len(nonce) == 16)
+            assert (len(key.key) == 16 and len(nonce) == 16)
         if variant == "Ascon-80pq":
-            assert (len(key) == 20 and len(nonce) == 16)
+            assert (len(key.key) == 20 and len(nonce) == 16)
         S = [0, 0, 0, 0, 0]
-        k = len(key) * 8   # bits
+        k = key.k   # bits
         a = 12   # rounds
         b = 8 if variant == "Ascon-128a" else 6   # rounds
         rate = 16 if variant == "Ascon-128a" else 8   # bytes
 
         self.ascon_initialize(S, k, rate, a, b, key, nonce)
-        # self.ascon_process_associated_data(S, b, rate, associateddata)
+        self.ascon_process_associated_data(S, b, rate, associateddata)
         ciphertext = self.ascon_process_plaintext(S, b, rate, plaintext)
         tag = self.ascon_finalize(S, rate, a, key)
         return ciphertext + tag
@@ -42,7 +487,7 @@ class Ascon:
     def ascon_decrypt(self, key, nonce, associateddata, ciphertext, variant="Ascon-128"):
         """
         Ascon decryption.
-        key: a bytes object of size 16 (for Ascon-128, Ascon-128a; 128-bit security) or 20 (for Ascon-80pq; 128-bit security)
+        key: a bytes object of size 16 (for Ascon-128, Ascon-128a; 128-bit security) or 20 (for Ascon-80pq; 128-bit security), or its KeyContext
         nonce: a bytes object of size 16 (must not repeat for the same key!)
         associateddata: a bytes object of arbitrary length
         ciphertext: a bytes object of arbitrary length (also contains tag)
@@ -50,20 +495,27 @@ class Ascon:
         returns a bytes object containing the plaintext or None if verification fails
         """
         assert variant in ["Ascon-128", "Ascon-128a", "Ascon-80pq"]
+        key = self.key_context(key)
         if variant in ["Ascon-128", "Ascon-128a"]:
-            assert (len(key) == 16 and len(nonce)
+            assert (len(key.key) == 16 and len(nonce)
                     == 16 and len(ciphertext) >= 16)
         if variant == "Ascon-80pq":
-            assert (len(key) == 20 and len(nonce)
+            assert (len(key.key) == 20 and len(nonce)
                     == 16 and len(ciphertext) >= 16)
+        if not (self.debug or self.debugpermutation):
+            plaintext = bytearray(len(ciphertext) - 16)
+            if self.ascon_decrypt_into(key, nonce, ciphertext, plaintext, variant, associateddata) < 0:
+                return None
+            return bytes(plaintext)
+
         S = [0, 0, 0, 0, 0]
-        k = len(key) * 8  # bits
+        k = key.k  # bits
         a = 12  # rounds
         b = 8 if variant == "Ascon-128a" else 6   # rounds
         rate = 16 if variant == "Ascon-128a" else 8   # bytes
 
         self.ascon_initialize(S, k, rate, a, b, key, nonce)
-        # self.ascon_process_associated_data(S, b, rate, associateddata)
+        self.ascon_process_associated_data(S, b, rate, associateddata)
         plaintext = self.ascon_process_ciphertext(S, b, rate, ciphertext[:-16])
         tag = self.ascon_finalize(S, rate, a, key)
         if tag == ciphertext[-16:]:
@@ -71,6 +523,229 @@ class Ascon:
         else:
             return None
 
+    def ascon_decrypt_into(self, key, nonce, src, out, variant="Ascon-128", associateddata=b""):
+        """
+        Ascon decryption into a caller-provided buffer, without per-block allocations.
+        key: a bytes object of size 16 (for Ascon-128, Ascon-128a; 128-bit security) or 20 (for Ascon-80pq; 128-bit security), or its KeyContext
+        nonce: a bytes-like object of size 16
+        src: a bytes-like object (e.g. a memoryview) holding the ciphertext followed by the tag
+        out: a writable buffer (e.g. a bytearray) of at least len(src) - 16 bytes
+        variant: "Ascon-128", "Ascon-128a", or "Ascon-80pq" (specifies key size, rate and number of rounds)
+        associateddata: a bytes-like object of arbitrary length
+        returns the number of plaintext bytes written to out, or -1 if verification fails (out is then zeroed)
+        """
+        assert variant in ["Ascon-128", "Ascon-128a", "Ascon-80pq"]
+        key = self.key_context(key)
+        assert (len(key.key) == (20 if variant == "Ascon-80pq" else 16) and
+                len(nonce) == 16 and len(src) >= 16)
+        length = len(src) - 16
+        assert len(out) >= length
+        if self.debug or self.debugpermutation:
+            plaintext = self.ascon_decrypt(key, nonce, associateddata, bytes(src), variant)
+            if plaintext is None:
+                return -1
+            out[:length] = plaintext
+            return length
+
+        a = 12  # rounds
+        b = 8 if variant == "Ascon-128a" else 6   # rounds
+        rate = 16 if variant == "Ascon-128a" else 8   # bytes
+        permutation_a = UNROLLED_PERMUTATIONS[a]
+        permutation_b = UNROLLED_PERMUTATIONS[b]
+
+        # initialization
+        x0, x1, x2 = key.initial_words(rate, a, b)
+        x3, x4 = TWO_WORDS.unpack_from(nonce)
+        x0, x1, x2, x3, x4 = permutation_a(x0, x1, x2, x3, x4)
+        zero_key = key.zero_key
+        x0 ^= zero_key[0]
+        x1 ^= zero_key[1]
+        x2 ^= zero_key[2]
+        x3 ^= zero_key[3]
+        x4 ^= zero_key[4]
+
+        # associated data
+        if len(associateddata) > 0:
+            for words in self.associated_data_blocks(associateddata, rate):
+                x0 ^= words[0]
+                if rate == 16:
+                    x1 ^= words[1]
+                x0, x1, x2, x3, x4 = permutation_b(x0, x1, x2, x3, x4)
+        x4 ^= 1
+
+        # full ciphertext blocks
+        full = length - length % rate
+        if rate == 8:
+            for i in range(0, full, 8):
+                c0, = WORD.unpack_from(src, i)
+                WORD.pack_into(out, i, x0 ^ c0)
+                x0, x1, x2, x3, x4 = permutation_b(c0, x1, x2, x3, x4)
+        else:
+            for i in range(0, full, 16):
+                c0, c1 = TWO_WORDS.unpack_from(src, i)
+                TWO_WORDS.pack_into(out, i, x0 ^ c0, x1 ^ c1)
+                x0, x1, x2, x3, x4 = permutation_b(c0, c1, x2, x3, x4)
+
+        # last (partial) block
+        lastlen = length - full
+        if lastlen < 8:
+            x0 = decrypt_last_word(x0, src, full, lastlen, out)
+        else:
+            c0, = WORD.unpack_from(src, full)
+            WORD.pack_into(out, full, x0 ^ c0)
+            x0 = c0
+            x1 = decrypt_last_word(x1, src, full + 8, lastlen - 8, out)
+
+        # finalization
+        finalize_key = key.finalize_key
+        if rate == 8:
+            x1 ^= finalize_key[0]
+            x2 ^= finalize_key[1]
+            x3 ^= finalize_key[2]
+        else:
+            x2 ^= finalize_key[0]
+            x3 ^= finalize_key[1]
+            x4 ^= finalize_key[2]
+        x0, x1, x2, x3, x4 = permutation_a(x0, x1, x2, x3, x4)
+        t0, t1 = TWO_WORDS.unpack_from(src, length)
+        if (x3 ^ key.tag_key[0] ^ t0) | (x4 ^ key.tag_key[1] ^ t1):
+            out[:length] = bytes(length)
+            return -1
+        return length
+
+    def ascon_decrypt_many(self, key, nonces, ciphertexts, variant="Ascon-128", associateddata=b""):
+        """
+        Ascon batch decryption, one NumPy uint64 lane per packet.
+        key: a bytes object of size 16 (for Ascon-128, Ascon-128a; 128-bit security) or 20 (for Ascon-80pq; 128-bit security), or its KeyContext
+        nonces: a sequence of bytes objects of size 16, one per ciphertext
+        ciphertexts: a sequence of bytes objects of arbitrary length (each also contains its tag)
+        variant: "Ascon-128", "Ascon-128a", or "Ascon-80pq" (specifies key size, rate and number of rounds)
+        associateddata: a bytes object shared by all packets, or a list with one bytes object per packet
+        returns (plaintexts, valid): a list with the plaintext or None per packet, and a list with True per packet whose tag verified (on every path)
+        Packets are grouped by their associated data and number of full blocks, the partial last block is masked per lane.
+        Without NumPy (or in debug mode), and in groups of less than MIN_LANES packets, they are decrypted one by one.
+        """
+        assert variant in ["Ascon-128", "Ascon-128a", "Ascon-80pq"]
+        assert len(nonces) == len(ciphertexts)
+        if not isinstance(associateddata, (list, tuple)):
+            associateddata = [associateddata] * len(ciphertexts)
+        assert len(associateddata) == len(ciphertexts)
+        if np is None or self.debug or self.debugpermutation:
+            plaintexts = [self.ascon_decrypt(key, nonce, ad, ciphertext, variant)
+                          for nonce, ad, ciphertext in zip(nonces, associateddata, ciphertexts)]
+            return plaintexts, [plaintext is not None for plaintext in plaintexts]
+
+        key = self.key_context(key)
+        if variant in ["Ascon-128", "Ascon-128a"]:
+            assert len(key.key) == 16
+        if variant == "Ascon-80pq":
+            assert len(key.key) == 20
+        rate = 16 if variant == "Ascon-128a" else 8   # bytes
+
+        groups = {}
+        for i, (nonce, ciphertext) in enumerate(zip(nonces, ciphertexts)):
+            assert (len(nonce) == 16 and len(ciphertext) >= 16)
+            groups.setdefault((bytes(associateddata[i]), (len(ciphertext) - 16) // rate), []).append(i)
+
+        plaintexts = [None] * len(ciphertexts)
+        valid = [False] * len(ciphertexts)
+        out = None
+        for (ad, blocks), lanes in groups.items():
+            if len(lanes) < MIN_LANES:
+                if out is None:
+                    out = bytearray(max(len(ciphertext) for ciphertext in ciphertexts))
+                for i in lanes:
+                    length = self.ascon_decrypt_into(
+                        key, nonces[i], memoryview(ciphertexts[i]), out, variant, ad)
+                    if length >= 0:
+                        plaintexts[i] = bytes(out[:length])
+                        valid[i] = True
+                continue
+            group_plaintexts, group_valid = self.ascon_decrypt_lanes(
+                key, [nonces[i] for i in lanes], [ciphertexts[i] for i in lanes], blocks, variant, ad)
+            for i, plaintext, ok in zip(lanes, group_plaintexts, group_valid):
+                if ok:
+                    plaintexts[i] = plaintext
+                    valid[i] = True
+        return plaintexts, valid
+
+    # === Ascon MAC and PRF ===
+
+    def ascon_mac(self, key, message, variant="Ascon-Mac", taglength=16):
+        """
+        Ascon message authentication code (MAC) and pseudorandom function (PRF).
+        key: a bytes object of size 16, or its KeyContext
+        message: a bytes object of arbitrary length (<= 16 bytes for "Ascon-PrfShort")
+        variant: "Ascon-Mac", "Ascon-Prf", or "Ascon-PrfShort" (the short-input PRF, a single permutation call)
+        taglength: the requested output bytelength l/8 (must be <=16 for variants "Ascon-Mac" and "Ascon-PrfShort", arbitrary for "Ascon-Prf"; should be >= 16 for 128-bit security)
+        returns a bytes object containing the authentication tag
+        """
+        assert variant in ["Ascon-Mac", "Ascon-Prf", "Ascon-PrfShort"]
+        key = self.key_context(key)
+        assert len(key.key) == 16
+        if variant in ["Ascon-Mac", "Ascon-PrfShort"]:
+            assert taglength <= 16
+        a = 12  # rounds
+        rate = 16  # bytes (output rate)
+
+        if variant == "Ascon-PrfShort":
+            assert len(message) <= 16
+            # Initialization + Message Processing (Absorbing)
+            IV = self.to_bytes([key.k, len(message) * 8, a + 64, taglength * 8]) + self.zero_bytes(4)
+            S = self.bytes_to_state(IV + key.key + bytes(message) + self.zero_bytes(16 - len(message)))
+            if self.debug:
+                self.printstate(S, "initial value:")
+
+            self.ascon_permutation(S, a)
+            if self.debug:
+                self.printstate(S, "process message:")
+
+            # Finalization (Squeezing)
+            T = self.int_to_bytes(S[3] ^ key.tag_key[0], 8) + self.int_to_bytes(S[4] ^ key.tag_key[1], 8)
+            return T[:taglength]
+
+        # Ascon-Mac and Ascon-Prf: initialization is cached per key
+        S = list(key.mac_state(self, variant))
+        if self.debug:
+            self.printstate(S, "initialization:")
+
+        # Message Processing (Absorbing), 32-byte input rate
+        msgblocksize = 32
+        m_padded = bytes(message) + b"\x80" + \
+            self.zero_bytes(msgblocksize - (len(message) % msgblocksize) - 1)
+        last = len(m_padded) - msgblocksize
+        for block in range(0, len(m_padded), msgblocksize):
+            S[0] ^= self.bytes_to_int(m_padded[block:block+8])
+            S[1] ^= self.bytes_to_int(m_padded[block+8:block+16])
+            S[2] ^= self.bytes_to_int(m_padded[block+16:block+24])
+            S[3] ^= self.bytes_to_int(m_padded[block+24:block+32])
+            if block != last:
+                self.ascon_permutation(S, a)
+        S[4] ^= 1
+        if self.debug:
+            self.printstate(S, "process message:")
+
+        # Finalization (Squeezing)
+        T = bytearray()
+        self.ascon_permutation(S, a)
+        while len(T) < taglength:
+            if T:
+                self.ascon_permutation(S, a)
+            T += self.int_to_bytes(S[0], 8) + self.int_to_bytes(S[1], 8)
+        if self.debug:
+            self.printstate(S, "finalization:")
+        return bytes(T[:taglength])
+
+    def ascon_mac_verify(self, key, message, tag, variant="Ascon-Mac"):
+        """
+        Checks an Ascon-Mac / Ascon-Prf / Ascon-PrfShort tag in constant time.
+        key, message, variant: as for ascon_mac
+        tag: a bytes-like object, its length is the taglength
+        returns True if the tag is valid
+        """
+        expected = self.ascon_mac(key, message, variant, len(tag))
+        return hmac.compare_digest(expected, bytes(tag))
+
     # === Ascon AEAD building blocks ===
 
     def ascon_initialize(self, S, k, rate, a, b, key, nonce):
@@ -81,19 +756,21 @@ class Ascon:
         rate: block size in bytes (8 for Ascon-128, Ascon-80pq; 16 for Ascon-128a)
         a: number of initialization/finalization rounds for permutation
         b: number of intermediate rounds for permutation
-        key: a bytes object of size 16 (for Ascon-128, Ascon-128a; 128-bit security) or 20 (for Ascon-80pq; 128-bit security)
+        key: a bytes object of size 16 (for Ascon-128, Ascon-128a; 128-bit security) or 20 (for Ascon-80pq; 128-bit security), or its KeyContext
         nonce: a bytes object of size 16
         returns nothing, updates S
         """
-        iv_zero_key_nonce = self.to_bytes(
-            [k, rate * 8, a, b] + (20-len(key))*[0]) + key + nonce
-        S[0], S[1], S[2], S[3], S[4] = self.bytes_to_state(iv_zero_key_nonce)
+        key = self.key_context(key)
+        assert (k == key.k)
+        S[0], S[1], S[2] = key.initial_words(rate, a, b)
+        S[3] = self.bytes_to_int(nonce[0:8])
+        S[4] = self.bytes_to_int(nonce[8:16])
         if self.debug:
             self.printstate(S, "initial value:")
 
         self.ascon_permutation(S, a)
 
-        zero_key = self.bytes_to_state(self.zero_bytes(40-len(key)) + key)
+        zero_key = key.zero_key
         S[0] ^= zero_key[0]
         S[1] ^= zero_key[1]
         S[2] ^= zero_key[2]
@@ -112,14 +789,10 @@ class Ascon:
         returns nothing, updates S
         """
         if len(associateddata) > 0:
-            a_zeros = rate - (len(associateddata) % rate) - 1
-            a_padding = self.to_bytes([0x80] + [0 for i in range(a_zeros)])
-            a_padded = associateddata + a_padding
-
-            for block in range(0, len(a_padded), rate):
-                S[0] ^= self.bytes_to_int(a_padded[block:block+8])
+            for words in self.associated_data_blocks(associateddata, rate):
+                S[0] ^= words[0]
                 if rate == 16:
-                    S[1] ^= self.bytes_to_int(a_padded[block+8:block+16])
+                    S[1] ^= words[1]
 
                 self.ascon_permutation(S, b)
 
@@ -228,24 +901,91 @@ class Ascon:
         S: Ascon state, a list of 5 64-bit integers
         rate: block size in bytes (8 for Ascon-128, Ascon-80pq; 16 for Ascon-128a)
         a: number of initialization/finalization rounds for permutation
-        key: a bytes object of size 16 (for Ascon-128, Ascon-128a; 128-bit security) or 20 (for Ascon-80pq; 128-bit security)
+        key: a bytes object of size 16 (for Ascon-128, Ascon-128a; 128-bit security) or 20 (for Ascon-80pq; 128-bit security), or its KeyContext
         returns the tag, updates S
         """
-        assert (len(key) in [16, 20])
-        S[rate//8+0] ^= self.bytes_to_int(key[0:8])
-        S[rate//8+1] ^= self.bytes_to_int(key[8:16])
-        S[rate//8+2] ^= self.bytes_to_int(key[16:] +
-                                          self.zero_bytes(24-len(key)))
+        key = self.key_context(key)
+        S[rate//8+0] ^= key.finalize_key[0]
+        S[rate//8+1] ^= key.finalize_key[1]
+        S[rate//8+2] ^= key.finalize_key[2]
 
         self.ascon_permutation(S, a)
 
-        S[3] ^= self.bytes_to_int(key[-16:-8])
-        S[4] ^= self.bytes_to_int(key[-8:])
+        S[3] ^= key.tag_key[0]
+        S[4] ^= key.tag_key[1]
         tag = self.int_to_bytes(S[3], 8) + self.int_to_bytes(S[4], 8)
         if self.debug:
             self.printstate(S, "finalization:")
         return tag
 
+    def ascon_decrypt_lanes(self, key, nonces, ciphertexts, blocks, variant, associateddata=b""):
+        """
+        Ascon decryption of a batch whose ciphertexts all have the same associated
+        data and number of full blocks - internal helper function of ascon_decrypt_many.
+        blocks: number of full rate-sized blocks in each ciphertext (without tag)
+        returns a list of plaintexts and a bool array of tag validity
+        """
+        lanes = len(ciphertexts)
+        key = self.key_context(key)
+        a = 12  # rounds
+        b = 8 if variant == "Ascon-128a" else 6   # rounds
+        rate = 16 if variant == "Ascon-128a" else 8   # bytes
+        words = rate // 8
+
+        def to_lanes(data, width):
+            return np.frombuffer(data, dtype=">u8").astype(np.uint64).reshape(lanes, width)
+
+        # initialization: IV and key words are shared, only the nonce differs per lane
+        N = to_lanes(b"".join(nonces), 2)
+        S = [np.full(lanes, word, dtype=np.uint64)
+             for word in key.initial_words(rate, a, b)] + [N[:, 0].copy(), N[:, 1].copy()]
+        ascon_permutation_lanes(S, a)
+        for w in range(5):
+            S[w] ^= np.uint64(key.zero_key[w])
+
+        # associated data, shared by all lanes
+        if len(associateddata) > 0:
+            for block in self.associated_data_blocks(associateddata, rate):
+                for w in range(words):
+                    S[w] ^= np.uint64(block[w])
+                ascon_permutation_lanes(S, b)
+        S[4] ^= np.uint64(1)
+
+        # ciphertext, zero-padded to blocks + 1 blocks
+        padded_len = (blocks + 1) * rate
+        lastlen = np.array([len(c) - 16 - blocks * rate for c in ciphertexts])
+        C = to_lanes(b"".join(bytes(c[:-16]).ljust(padded_len, b"\x00")
+                              for c in ciphertexts), padded_len // 8)
+        P = np.empty_like(C)
+        for block in range(blocks):
+            for w in range(words):
+                Ci = C[:, block*words + w]
+                P[:, block*words + w] = S[w] ^ Ci
+                S[w] = Ci.copy()
+            ascon_permutation_lanes(S, b)
+
+        # last block: per lane, keep the state bytes past the ciphertext and add the padding
+        for w in range(words):
+            Ci = C[:, blocks*words + w]
+            P[:, blocks*words + w] = S[w] ^ Ci
+            j = np.clip(lastlen - 8*w, -1, 8) + 1
+            S[w] = Ci ^ (S[w] & LAST_BLOCK_KEEP[j]) ^ LAST_BLOCK_PADDING[j]
+
+        # finalization
+        for w in range(3):
+            S[words + w] ^= np.uint64(key.finalize_key[w])
+        ascon_permutation_lanes(S, a)
+        S[3] ^= np.uint64(key.tag_key[0])
+        S[4] ^= np.uint64(key.tag_key[1])
+
+        T = to_lanes(b"".join(bytes(c[-16:]) for c in ciphertexts), 2)
+        valid = (S[3] == T[:, 0]) & (S[4] == T[:, 1])
+
+        data = P.astype(">u8").tobytes()
+        plaintexts = [data[i*padded_len:i*padded_len + blocks*rate + lastlen[i]]
+                      for i in range(lanes)]
+        return plaintexts, valid
+
     # === Ascon permutation ===
 
     def ascon_permutation(self, S, rounds=1):
@@ -254,15 +994,24 @@ class Ascon:
         S: Ascon state, a list of 5 64-bit integers
         rounds: number of rounds to perform
         returns nothing, updates S
+        Uses the unrolled fast engine unless debugpermutation is set, in which
+        case the reference round loop below runs and prints every step.
         """
         assert (rounds <= 12)
-        if self.debugpermutation:
-            self.printwords(S, "permutation input:")
+        if not self.debugpermutation:
+            permutation = UNROLLED_PERMUTATIONS.get(rounds)
+            if permutation:
+                S[0], S[1], S[2], S[3], S[4] = permutation(
+                    S[0], S[1], S[2], S[3], S[4])
+            else:
+                S[0], S[1], S[2], S[3], S[4] = ascon_p_rounds(
+                    S[0], S[1], S[2], S[3], S[4], rounds)
+            return
+        self.printwords(S, "permutation input:")
         for r in range(12-rounds, 12):
             # --- add round constants ---
             S[2] ^= (0xf0 - r*0x10 + r*0x1)
-            if self.debugpermutation:
-                self.printwords(S, "round constant addition:")
+            self.printwords(S, "round constant addition:")
             # --- substitution layer ---
             S[0] ^= S[4]
             S[4] ^= S[3]
@@ -274,16 +1023,14 @@ class Ascon:
             S[0] ^= S[4]
             S[3] ^= S[2]
             S[2] ^= 0XFFFFFFFFFFFFFFFF
-            if self.debugpermutation:
-                self.printwords(S, "substitution layer:")
+            self.printwords(S, "substitution layer:")
             # --- linear diffusion layer ---
             S[0] ^= self.rotr(S[0], 19) ^ self.rotr(S[0], 28)
             S[1] ^= self.rotr(S[1], 61) ^ self.rotr(S[1], 39)
             S[2] ^= self.rotr(S[2],  1) ^ self.rotr(S[2],  6)
             S[3] ^= self.rotr(S[3], 10) ^ self.rotr(S[3], 17)
             S[4] ^= self.rotr(S[4],  7) ^ self.rotr(S[4], 41)
-            if self.debugpermutation:
-                self.printwords(S, "linear diffusion layer:")
+            self.printwords(S, "linear diffusion layer:")
 
     # === helper functions ===
 
@@ -298,13 +1045,13 @@ class Ascon:
         return bytes(bytearray(l))
 
     def bytes_to_int(self, bytes):
-        return sum([bi << ((len(bytes) - 1 - i)*8) for i, bi in enumerate(self.to_bytes(bytes))])
+        return int.from_bytes(bytes, "big")
 
     def bytes_to_state(self, bytes):
         return [self.bytes_to_int(bytes[8*w:8*(w+1)]) for w in range(5)]
 
     def int_to_bytes(self, integer, nbytes):
-        return self.to_bytes([(integer >> ((nbytes - 1 - i) * 8)) % 256 for i in range(nbytes)])
+        return (integer % (1 << (8 * nbytes))).to_bytes(nbytes, "big")
 
     def rotr(self, val, r):
         return (val >> r) | ((val & (1 << r)-1) << (64-r))
@@ -322,7 +1069,121 @@ class Ascon:
         print("\n".join(["  x{i}={s:016x}".format(**locals())
               for i, s in enumerate(S)]))
 
-    # === some demo if called directly ===
+
+# === Ascon AEAD streaming ===
+
+
+class AsconStream:
+    """
+    Incremental Ascon AEAD - base class of AsconEncryptor and AsconDecryptor.
+    ascon: the Ascon instance doing the work
+    key: a bytes object of size 16 (for Ascon-128, Ascon-128a) or 20 (for Ascon-80pq), or its KeyContext
+    nonce: a bytes object of size 16 (must not repeat for the same key!)
+    variant: "Ascon-128", "Ascon-128a", or "Ascon-80pq"
+    associateddata: a bytes-like object of arbitrary length
+    Chunks passed to update() may be bytes, bytearray or memoryview objects of any size;
+    complete blocks are processed right away, a partial block is buffered.
+    """
+
+    def __init__(self, ascon, key, nonce, variant="Ascon-128", associateddata=b""):
+        assert variant in ["Ascon-128", "Ascon-128a", "Ascon-80pq"]
+        self.ascon = ascon
+        self.key = ascon.key_context(key)
+        assert (len(nonce) == 16 and
+                len(self.key.key) == (20 if variant == "Ascon-80pq" else 16))
+        self.a = 12  # rounds
+        self.b = 8 if variant == "Ascon-128a" else 6   # rounds
+        self.rate = 16 if variant == "Ascon-128a" else 8   # bytes
+        self.S = [0, 0, 0, 0, 0]
+        ascon.ascon_initialize(self.S, self.key.k, self.rate,
+                               self.a, self.b, self.key, nonce)
+        ascon.ascon_process_associated_data(
+            self.S, self.b, self.rate, associateddata)
+        self.buffer = bytearray()
+        self.finalized = False
+
+    def update(self, chunk):
+        """
+        chunk: a bytes-like object with the next input bytes
+        returns the output bytes of the blocks completed by this chunk
+        """
+        assert not self.finalized
+        rate = self.rate
+        data = memoryview(chunk)
+        out = bytearray()
+        if self.buffer:
+            missing = rate - len(self.buffer)
+            self.buffer += data[:missing]
+            data = data[missing:]
+            if len(self.buffer) < rate:
+                return bytes(out)
+            self.process_block(self.buffer, out)
+            self.buffer.clear()
+        full = len(data) - len(data) % rate
+        for block in range(0, full, rate):
+            self.process_block(data[block:block+rate], out)
+        self.buffer += data[full:]
+        return bytes(out)
+
+    def process_block(self, block, out):
+        raise NotImplementedError()
+
+
+class AsconEncryptor(AsconStream):
+    """
+    Incremental Ascon encryption: update(plaintext chunk) returns ciphertext,
+    finalize() returns the last ciphertext bytes followed by the 16-byte tag.
+    """
+
+    def process_block(self, block, out):
+        S = self.S
+        for w in range(self.rate // 8):
+            S[w] ^= int.from_bytes(block[8*w:8*(w+1)], "big")
+            out += S[w].to_bytes(8, "big")
+        self.ascon.ascon_permutation(S, self.b)
+
+    def finalize(self):
+        """
+        returns the ciphertext of the buffered partial block followed by the tag
+        """
+        assert not self.finalized
+        self.finalized = True
+        ciphertext = self.ascon.ascon_process_plaintext(
+            self.S, self.b, self.rate, bytes(self.buffer))
+        return ciphertext + self.ascon.ascon_finalize(self.S, self.rate, self.a, self.key)
+
+
+class AsconDecryptor(AsconStream):
+    """
+    Incremental Ascon decryption: update(ciphertext chunk) returns plaintext,
+    finalize(tag) processes the last partial block and verifies the tag.
+    Plaintext returned by update() is not authenticated until finalize() succeeds.
+    """
+
+    def process_block(self, block, out):
+        S = self.S
+        for w in range(self.rate // 8):
+            Ci = int.from_bytes(block[8*w:8*(w+1)], "big")
+            out += (S[w] ^ Ci).to_bytes(8, "big")
+            S[w] = Ci
+        self.ascon.ascon_permutation(S, self.b)
+
+    def finalize(self, tag):
+        """
+        tag: a bytes-like object of size 16 (the last 16 bytes of the ciphertext)
+        returns the plaintext of the buffered partial block, or None if verification fails
+        """
+        assert not self.finalized
+        self.finalized = True
+        plaintext = self.ascon.ascon_process_ciphertext(
+            self.S, self.b, self.rate, bytes(self.buffer))
+        if hmac.compare_digest(self.ascon.ascon_finalize(self.S, self.rate, self.a, self.key), bytes(tag)):
+            return plaintext
+        else:
+            return None
+
+
+# === some demo if called directly ===
 
 
 def demo_print(data, asc):
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+
+"""
+Known-answer tests and benchmark for the Ascon implementation in ascon.py.
+Usage: python -m src.ascon_bench [iterations]
+Checks every encryption/decryption path against the KAT vectors first, then
+prints packets/s and us/byte per variant, operation and payload size as JSON.
+"""
+
+import json
+import sys
+import time
+from . import ascon
+
+
+# Ascon v1.2 known-answer vectors, a subset of the NIST LWC KAT files
+# (LWC_AEAD_KAT_128_128.txt, LWC_AEAD_KAT_160_128.txt for Ascon-80pq).
+# Each entry is (Count, CT): Key and Nonce are 00 01 02 ..., PT and AD are
+# 00 01 02 ... of (Count-1) // 33 and (Count-1) % 33 bytes, CT includes the tag.
+KAT_VECTORS = {
+    "Ascon-128": [
+        (1, "E355159F292911F794CB1432A0103A8A"),
+        (2, "944DF887CD4901614C5DEDBC42FC0DA0"),
+        (9, "E3DCF95F869752F61CD7A2DB895F918E"),
+        (18, "79AC0FA2BF3859D6962D0C0AF45B1D3E"),
+        (33, "8C74C569E1220E9FE403926E5F9B8956"),
+        (34, "BC18C3F4E39ECA7222490D967C79BFFC92"),
+        (35, "BD4102B707775C3C155AE497B43BF834E5"),
+        (42, "695A8F1BD29D59C5C82021B6CACE80C895"),
+        (51, "86D1F8C7161F1D833B98DB88606A9776A7"),
+        (66, "B953BF48496164CD10B79FDFA1FF635659"),
+        (232, "BC820DBDF7A463CE9985966C40BC56A9C5180E23F7086C"),
+        (233, "BD4640C4DA2FFA03B74F698C695A740DE9F8B9C060CCE3"),
+        (240, "69FFEE6F5505A4314219112BF5A163EA5D73EB778848BE"),
+        (249, "8684539A9FCFF96A10554F2BA496365CA9EC83456635F2"),
+        (264, "B96C78651B6246F02CDD89EE300146CA89CC41558474B0"),
+        (265, "BC820DBDF7A4631C01A8807A44254B42AC6BB490DA1E000A"),
+        (266, "BD4640C4DA2FFA565004C927913485A90B18BE0F3741A393"),
+        (273, "69FFEE6F5505A489E897E5F141B2E4A2DAD326085A79408A"),
+        (282, "8684539A9FCFF9F60A842C859E594D287C37E3CC96D1BB27"),
+        (297, "B96C78651B6246B0F4DDFDF86CED08389F0D3A1B58A4882A"),
+        (298, "BC820DBDF7A4631C5B46D53803F5D35E0A27D353508C9D054A"),
+        (299, "BD4640C4DA2FFA56DC8FA8FC61C17487D416BC2500FE08AAD4"),
+        (306, "69FFEE6F5505A4897ECF5BDD353828B5C3B397863CE8BFD719"),
+        (315, "8684539A9FCFF9F68A823C7312B7CD22838B56833BA5390A96"),
+        (330, "B96C78651B6246B0C3CD840D6155C99EB0E4185FE0A0C9DC69"),
+        (496, "BC820DBDF7A4631C5B29884AD6917516D420A5BC2E5357D010818F0B5F7859"),
+        (497, "BD4640C4DA2FFA56DC79F7FDD07369A9779D0C974CA41061D4E1250B93D8F0"),
+        (504, "69FFEE6F5505A4897E2EC80CBDFF67FB25542F1F646BEC9B625408219371A9"),
+        (513, "8684539A9FCFF9F68A7A496010F129DC0722BC4625170CC8FBBABCE67AC6D0"),
+        (528, "B96C78651B6246B0C3B1A5D373B0D532E2F22E811EFA3311A647577ED0C9E1"),
+        (529, "BC820DBDF7A4631C5B29884AD69175C3F58E28436DD71556D58DFA56AC890BEB"),
+        (530, "BD4640C4DA2FFA56DC79F7FDD07369DD23185CC86B06939E868E420B69A72AEA"),
+        (537, "69FFEE6F5505A4897E2EC80CBDFF67CE31614DAC97643C45940A8F9E7964613A"),
+        (546, "8684539A9FCFF9F68A7A496010F129B5A34081410D25FBBC68B9216046750AE6"),
+        (561, "B96C78651B6246B0C3B1A5D373B0D51656B8B02AE9C620D98ED6E1F8E5589F64"),
+        (562, "BC820DBDF7A4631C5B29884AD69175C33839D3160FF350D4184734773C11BF5603"),
+        (563, "BD4640C4DA2FFA56DC79F7FDD07369DDF328827210DAEEF1B00B69D0EE9FC7883E"),
+        (570, "69FFEE6F5505A4897E2EC80CBDFF67CE45F405DA3F52A534524CD268ABAB34DE1C"),
+        (579, "8684539A9FCFF9F68A7A496010F129B5C9F24CC11E01C76F3C9F6F6F41D480BFC8"),
+        (594, "B96C78651B6246B0C3B1A5D373B0D5168D9FD57F7A9D6C684B8A005CB11EE3A0F0"),
+        (1024, "BC820DBDF7A4631C5B29884AD69175C3389655CA8135C9E6E8FE7467276F89B824D9C4AF5DA9337BA9AEC86C359A02"),
+        (1025, "BD4640C4DA2FFA56DC79F7FDD07369DDF386CACC1CB31BF592F6AE1B44C716A97F9D4F7AEBB2389D65B69CFA2AEA2A"),
+        (1032, "69FFEE6F5505A4897E2EC80CBDFF67CE457E42289AFB4317B2F4B6A9D92E72504EFFA6F2AB330A12D04BC91E59CBE3"),
+        (1041, "8684539A9FCFF9F68A7A496010F129B5C9A3860BFF417050D0281D0BA8F4B817F8CF3FD814F99F92665B6C532638DF"),
+        (1056, "B96C78651B6246B0C3B1A5D373B0D5168DCA4A96734CF0DDF5F92F8D15E30278032E807419AC213C79CA3A5C4C0BFE"),
+        (1057, "BC820DBDF7A4631C5B29884AD69175C3389655CA8135C9E6E8FE7467276F89770D975EFAB2EBAA41C0F3ABEEE425E784"),
+        (1058, "BD4640C4DA2FFA56DC79F7FDD07369DDF386CACC1CB31BF592F6AE1B44C7168C1B3F4BF5810ED8FC586C8151954393ED"),
+        (1065, "69FFEE6F5505A4897E2EC80CBDFF67CE457E42289AFB4317B2F4B6A9D92E7244B7B19FFBD83AC4269C13DDF5D335F92C"),
+        (1074, "8684539A9FCFF9F68A7A496010F129B5C9A3860BFF417050D0281D0BA8F4B8AAA418C1534CA1A6C18413253E0325E310"),
+        (1089, "B96C78651B6246B0C3B1A5D373B0D5168DCA4A96734CF0DDF5F92F8D15E30270279BF6A6CC3F2FC9350B915C292BDB8D"),
+    ],
+    "Ascon-128a": [
+        (1, "7A834E6F09210957067B10FD831F0078"),
+        (2, "AF3031B07B129EC84153373DDCABA528"),
+        (9, "D60E199FFD3F9B694713DABC6D89F46F"),
+        (18, "917D530F34157158CF8CA49D01AF44F0"),
+        (33, "2FDEE642B4C31C2F205DCC8B3DAD4542"),
+        (34, "6E652B55BFDC8CAD2EC43815B1666B1A3A"),
+        (35, "E9C2813CC8C6DD2F245F3BB976DA566E9D"),
+        (42, "3422167316638992B5DCDB28D92DCB724A"),
+        (51, "BC1684F3282120E292F39B0D86CC6DE270"),
+        (66, "A56CB8F79B16FC91A8CD0DE2F70DC8AF2C"),
+        (232, "6E490CFED5B35449F1BD8AB58546AA5FFA2FEE5AFE13A4"),
+        (233, "E92D2A65CEE972E6974E27994316AE55FC20582C175027"),
+        (240, "34D3B7EDB89B1DAB00E12EA7BC5A536AA45FC6901F32E6"),
+        (249, "BC26A071C86E16561DFA28B84452EB4BE4A5F2BAF02749"),
+        (264, "A55236AC020DBD7244D4B7338B478C1B4648B252CD9BFD"),
+        (265, "6E490CFED5B35467B89C7E12863CE5F76AFC808FFF786B9E"),
+        (266, "E92D2A65CEE9727F42AFA1156833C08994F2A7338B9B020A"),
+        (273, "34D3B7EDB89B1D5069711093B89517C4C8AAEF102B8910BA"),
+        (282, "BC26A071C86E16AD07E1D444243C7E573509E03B19233970"),
+        (297, "A55236AC020DBDA78E59E325520306254892D585F50A3EF7"),
+        (298, "6E490CFED5B35467676AC69B2C75CE045D5425EBBC299EBE79"),
+        (299, "E92D2A65CEE9727FB229CDFECC621ACA725E60575571946F95"),
+        (306, "34D3B7EDB89B1D5067BDAC136A8929AE1500559312833B547A"),
+        (315, "BC26A071C86E16AD25961F7A3D7CD63D49B2D2748FBF8BA1E2"),
+        (330, "A55236AC020DBDA74C9A2AD9808F54E4466969266F4714DF34"),
+        (496, "6E490CFED5B3546767350CD83C4ACF9482EF04436DDD22BC7898E61FDFA0A4"),
+        (497, "E92D2A65CEE9727FB2FCCA9A72BF7851304A8A108721079C1B2587312C303D"),
+        (504, "34D3B7EDB89B1D5067C4EC9EB80529FEDD0E0D98AA67DD96D223737ED384DD"),
+        (513, "BC26A071C86E16AD251FD2AD8D3139382808D9D51C8B899C5E71C42190C2A8"),
+        (528, "A55236AC020DBDA74CE6CCD10C68C4F70A6AF30B5B1F8826DF3E9B47C80024"),
+        (529, "6E490CFED5B3546767350CD83C4ACFBDB10F611B7D79278BD8067FC1BCDF39BE"),
+        (530, "E92D2A65CEE9727FB2FCCA9A72BF781EAD1682916FDA1AB6BFD8ABD9AD6DBDA5"),
+        (537, "34D3B7EDB89B1D5067C4EC9EB8052962522E547863AC130D032A06927D4261DB"),
+        (546, "BC26A071C86E16AD251FD2AD8D3139F440CDB729F8BCBBBCDF377E2D38D3EF15"),
+        (561, "A55236AC020DBDA74CE6CCD10C68C4D88A95D7D97F774CB274ACBB055AF1938E"),
+        (562, "6E490CFED5B3546767350CD83C4ACFBD4C24A6876D90D20C110E12F5A5BE51967D"),
+        (563, "E92D2A65CEE9727FB2FCCA9A72BF781E611A5395FCEE412A0DEF634FD58BEE6085"),
+        (570, "34D3B7EDB89B1D5067C4EC9EB8052962E59C268600E40106B72E37D427A00FB4D8"),
+        (579, "BC26A071C86E16AD251FD2AD8D3139F43B1D71C0094E2B77150642B91FDB91FCB2"),
+        (594, "A55236AC020DBDA74CE6CCD10C68C4D8510D0B9D2AA8905C902D5637AB52D5105B"),
+        (1024, "6E490CFED5B3546767350CD83C4ACFBD4CFB4BD07ABF5BC24D4B104645717C52960C71DCC79BC5EFFFF314E0D09CF6"),
+        (1025, "E92D2A65CEE9727FB2FCCA9A72BF781E615804E0484A3928D960FA38E61F76BB4E612B91892B7C382B924E607C8433"),
+        (1032, "34D3B7EDB89B1D5067C4EC9EB8052962E581F38017532B881F2E2F3947AF8E1F27D676A77D16F02510333C86AF5D2F"),
+        (1041, "BC26A071C86E16AD251FD2AD8D3139F43BEDCFD8CBACC5C8E2F5BF5C995EF2BC0FA1677F992B205EA248F130236398"),
+        (1056, "A55236AC020DBDA74CE6CCD10C68C4D8514450A382BC87C68946D86A921DD8D512C20775E27C66BEBBFE27460BC467"),
+        (1057, "6E490CFED5B3546767350CD83C4ACFBD4CFB4BD07ABF5BC24D4B104645717C1E513ABFD1335ACFD296C49A35E0D54B73"),
+        (1058, "E92D2A65CEE9727FB2FCCA9A72BF781E615804E0484A3928D960FA38E61F76D5124A982608C3FA36F4DF11D1FF2CE8C2"),
+        (1065, "34D3B7EDB89B1D5067C4EC9EB8052962E581F38017532B881F2E2F3947AF8E20ECDD28B8873F384F6F35DAAF7A5847B2"),
+        (1074, "BC26A071C86E16AD251FD2AD8D3139F43BEDCFD8CBACC5C8E2F5BF5C995EF2B013E624B646BF32552615B8A6CB0DA908"),
+        (1089, "A55236AC020DBDA74CE6CCD10C68C4D8514450A382BC87C68946D86A921DD88E2ADDDFBBE77D4112830E01960B9D38D5"),
+    ],
+    "Ascon-80pq": [
+        (1, "ABB688EFA0B9D56B33277A2C97D2146B"),
+        (2, "A259D760E87B0CA73002C3A01E69B567"),
+        (9, "D80B5C5C8FA97EE33D916C61772B2E23"),
+        (18, "56726CE502528807D7F85C2E1CBE386B"),
+        (33, "46CF5EA5306FCF255C61F5EEB6373B80"),
+        (34, "28AA80FFF4CA3AF32F60EBCAF63A4CCAB7"),
+        (35, "A923553474FF995842ECCDC66E0BCA3D45"),
+        (42, "E1701C9E900DEE72AE3D4CCDC111582787"),
+        (51, "39E6EE3F7A8A072C344F2A2EF2BAF75FA2"),
+        (66, "CCA9253BCF9E509130DF183FF6A33B9E5D"),
+        (232, "2846418067CE936856B80187E0CC51865A45CCE6FE94A3"),
+        (233, "A96AE9C305FCF68BBE5E8141A8CA48CC051F54DC2BAAC3"),
+        (240, "E16C12DD1DB74F1F613FE6309C759B8160AF88BD1B81EC"),
+        (249, "393E98C899061C3B37D634F1799FE540BE7A5E99F78758"),
+        (264, "CC4E07E5FB13426850873172DD1C36A9F6051C7300A348"),
+        (265, "2846418067CE93861A484E22565F161146FB6F47913803F9"),
+        (266, "A96AE9C305FCF6B4D9DCC11C94BD0237CC5FBD8A411CBFDF"),
+        (273, "E16C12DD1DB74FA7F2928415D5A82D617BA364A8C5FF084F"),
+        (282, "393E98C899061CFCED13063CCCFC0FD5FFEECE884DBB9AAD"),
+        (297, "CC4E07E5FB13426E0FA18908F75E444CF1E7EDED03BB9E90"),
+        (298, "2846418067CE9386B4CB9A729E5FE92BB573F95EF31748543E"),
+        (299, "A96AE9C305FCF6B4A9F8E0F2DA86FA7CA273E2ECD72D84EF46"),
+        (306, "E16C12DD1DB74FA7738EB40ABED9F4161FFD1E3224FAFF94E3"),
+        (315, "393E98C899061CFCF5E685340FA71C37D3A0AB2AEDAC46C019"),
+        (330, "CC4E07E5FB13426EFF2190288691F9A3F389FF34B980F44A8E"),
+        (496, "2846418067CE9386B47F0584BF9EEE8D5C48122DD5E9E11DA9A037A8B6502A"),
+        (497, "A96AE9C305FCF6B4A9A50B1539B8965D3DB1611DDBDF6DFBBCE0E465AC6F10"),
+        (504, "E16C12DD1DB74FA773415872B01CB8281CD822572651275A07E8FDB38804D6"),
+        (513, "393E98C899061CFCF58C8FDADDE7C984DE2936E258E97D96F2A45A6CD74959"),
+        (528, "CC4E07E5FB13426EFFD17B0F51A6A8D0AC133E757ED09743FAF30C928F9AFC"),
+        (529, "2846418067CE9386B47F0584BF9EEE3F818CA2B264F3BBFC40B773D0EB81F594"),
+        (530, "A96AE9C305FCF6B4A9A50B1539B896E71A04D7949337EDF069808760AE7D7EEE"),
+        (537, "E16C12DD1DB74FA773415872B01CB834DBE18B2D5C6C9E77DF52E8CABB7A3283"),
+        (546, "393E98C899061CFCF58C8FDADDE7C9E47ECF3BE0A55D1BF849DA473CBDD69207"),
+        (561, "CC4E07E5FB13426EFFD17B0F51A6A83016F564E1D50A502B9B4FE794A806DC75"),
+        (562, "2846418067CE9386B47F0584BF9EEE3F5198E62C65AE57B9C6B19FCCC757B8D1DE"),
+        (563, "A96AE9C305FCF6B4A9A50B1539B896E7804C7F86778B9CDBBE31F55D1DF1AE6A7C"),
+        (570, "E16C12DD1DB74FA773415872B01CB834C3A721C972C2DD675595459FFF639D2487"),
+        (579, "393E98C899061CFCF58C8FDADDE7C9E4F5CA8B173D13FAE027F5E0B85139ED2D17"),
+        (594, "CC4E07E5FB13426EFFD17B0F51A6A830BF95D181B8B773440DFD022DA93B3265F5"),
+        (1024, "2846418067CE9386B47F0584BF9EEE3F51A62969F011D86DE54D5B258AF88C36F5E10FBE0CAAAAD1D25AFE7AB34546"),
+        (1025, "A96AE9C305FCF6B4A9A50B1539B896E7806BDE0E023E83BD7916CCD892E9D2FF46431D0C6D829FF98FBF3C0D0AA1DE"),
+        (1032, "E16C12DD1DB74FA773415872B01CB834C3D0A42168DBA2870A847702FE00562C880375BD75518B4BD410608FEF130B"),
+        (1041, "393E98C899061CFCF58C8FDADDE7C9E4F58ED2E39C4B7F2053C05963BD3E114C57325688E2CF1EF80C089A8085E749"),
+        (1056, "CC4E07E5FB13426EFFD17B0F51A6A830BF484C9651D77679971E8EB4A8EDB5229217E2A8A4EF4E706D2576F272F77D"),
+        (1057, "2846418067CE9386B47F0584BF9EEE3F51A62969F011D86DE54D5B258AF88C213DBF091B28119AEDB36D0B0980E664D9"),
+        (1058, "A96AE9C305FCF6B4A9A50B1539B896E7806BDE0E023E83BD7916CCD892E9D2852E268E5D6D8AA577FB15F473AD1CE73C"),
+        (1065, "E16C12DD1DB74FA773415872B01CB834C3D0A42168DBA2870A847702FE00565253E7B803F6561AAB65834B6600DE5B50"),
+        (1074, "393E98C899061CFCF58C8FDADDE7C9E4F58ED2E39C4B7F2053C05963BD3E119A736B8C4D9C4B1B0B48D0FB3A34127362"),
+        (1089, "CC4E07E5FB13426EFFD17B0F51A6A830BF484C9651D77679971E8EB4A8EDB5A00782A94C72B2B02D87DCF4AF75DB6996"),
+    ],
+}
+
+# Ascon v1.2 MAC / PRF known-answer vectors, from the ascon-c KAT files of
+# asconmacv12, asconprfv12 and asconprfsv12 (as generated by pyascon, the
+# designers' Python implementation). Each entry is (Count, Tag): Key is
+# 00 01 02 ..., Msg is 00 01 02 ... of Count-1 bytes, 16-byte tags. The
+# message lengths cover partial, full and several 32-byte blocks.
+MAC_KAT_VECTORS = {
+    "Ascon-Mac": [
+        (1, "EB1AF688825D66BF2D53E135F9323315"),
+        (2, "81F3C3537C5595AAA0D5780B9F88A043"),
+        (16, "D46B79F2ADD7783BC167EF2CC2DF5581"),
+        (17, "A7915E83EE1AA71422CFD90868E22DC2"),
+        (32, "B6424FD4C356EF1D510682B108693890"),
+        (33, "892523D61028799C507D1644126F03EF"),
+        (34, "FBBFA47C9364499B9526F4CD0D94F9E4"),
+        (65, "EDC563C5A0BB6761073F8A6FB6238234"),
+    ],
+    "Ascon-Prf": [
+        (1, "2A766FE9A4894073BC811B19D54AC33D"),
+        (2, "62DCF5FD8253089B765E2CF1A0D1A4FA"),
+        (16, "E2E7FD6C197C93C5BC8E3AB360971BB3"),
+        (17, "87287B11BFBCC92D43E3667F7AC30C90"),
+        (32, "4A1D07C9BCBF8C93FA57465823CE0E71"),
+        (33, "5674455F29416F5081D05EE3C31E286B"),
+        (34, "B3D6281E1353B364439FD02040BED341"),
+        (65, "4462AD92ACAD641AF3BE4BCC0C37FA1D"),
+    ],
+    "Ascon-PrfShort": [
+        (1, "5006EB1808193809F981151B19E59299"),
+        (2, "BDE4E1A8FB90CD5A2F2DBA6184B65395"),
+        (16, "F128427ADF7EBC6B5E18747102D2ACDD"),
+        (17, "BD03EA334BEBEFC4D7DDAEF4B1DF1485"),
+    ],
+}
+
+PAYLOAD_SIZES = (8, 16, 32, 64, 128, 255)
+
+
+def kat_inputs(variant, count):
+    keysize = 20 if variant == "Ascon-80pq" else 16
+    key = bytes(range(keysize))
+    nonce = bytes(range(16))
+    plaintext = bytes(range((count - 1) // 33))
+    associateddata = bytes(range((count - 1) % 33))
+    return key, nonce, associateddata, plaintext
+
+
+def check_kat(asc):
+    """
+    Runs the KAT vectors through ascon_encrypt, ascon_decrypt, ascon_decrypt_into,
+    ascon_decrypt_many (one by one and in NumPy lanes) and the streaming objects, and the MAC KAT vectors
+    through ascon_mac and ascon_mac_verify.
+    returns a list of (variant, Count, path) that failed, empty if all passed
+    """
+    failures = []
+    for variant, vectors in KAT_VECTORS.items():
+        nonces, ciphertexts, ads, plaintexts = [], [], [], []
+        for count, ct in vectors:
+            key, nonce, associateddata, plaintext = kat_inputs(variant, count)
+            ciphertext = bytes.fromhex(ct)
+
+            if asc.ascon_encrypt(key, nonce, associateddata, plaintext, variant) != ciphertext:
+                failures.append((variant, count, "encrypt"))
+            if asc.ascon_decrypt(key, nonce, associateddata, ciphertext, variant) != plaintext:
+                failures.append((variant, count, "decrypt"))
+            tampered = ciphertext[:-1] + bytes([ciphertext[-1] ^ 1])
+            if asc.ascon_decrypt(key, nonce, associateddata, tampered, variant) is not None:
+                failures.append((variant, count, "decrypt (tampered tag)"))
+
+            out = bytearray(len(plaintext))
+            length = asc.ascon_decrypt_into(
+                key, nonce, memoryview(ciphertext), out, variant, associateddata)
+            if length != len(plaintext) or out != plaintext:
+                failures.append((variant, count, "decrypt_into"))
+
+            encryptor = ascon.AsconEncryptor(asc, key, nonce, variant, associateddata)
+            decryptor = ascon.AsconDecryptor(asc, key, nonce, variant, associateddata)
+            streamed = bytearray()
+            for i in range(0, len(plaintext), 5):
+                streamed += encryptor.update(plaintext[i:i+5])
+            if streamed + encryptor.finalize() != ciphertext:
+                failures.append((variant, count, "AsconEncryptor"))
+            streamed = bytearray()
+            for i in range(0, len(ciphertext) - 16, 5):
+                streamed += decryptor.update(memoryview(ciphertext)[i:min(i+5, len(ciphertext) - 16)])
+            tail = decryptor.finalize(ciphertext[-16:])
+            if tail is None or streamed + tail != plaintext:
+                failures.append((variant, count, "AsconDecryptor"))
+
+            nonces.append(nonce)
+            ciphertexts.append(ciphertext)
+            ads.append(associateddata)
+            plaintexts.append(plaintext)
+
+        many, valid = asc.ascon_decrypt_many(
+            kat_inputs(variant, 1)[0], nonces, ciphertexts, variant, ads)
+        for (count, ct), plaintext, result in zip(vectors, plaintexts, many):
+            if result != plaintext:
+                failures.append((variant, count, "decrypt_many"))
+        if valid != [True] * len(vectors):
+            failures.append((variant, None, "decrypt_many (valid)"))
+        # MIN_LANES copies of each packet, so every group takes the NumPy lanes
+        many, valid = asc.ascon_decrypt_many(
+            kat_inputs(variant, 1)[0], nonces * ascon.MIN_LANES, ciphertexts * ascon.MIN_LANES,
+            variant, ads * ascon.MIN_LANES)
+        for (count, ct), plaintext, result in zip(vectors * ascon.MIN_LANES, plaintexts * ascon.MIN_LANES, many):
+            if result != plaintext:
+                failures.append((variant, count, "decrypt_many (lanes)"))
+        if valid != [True] * len(vectors) * ascon.MIN_LANES:
+            failures.append((variant, None, "decrypt_many (lanes, valid)"))
+
+    for variant, vectors in MAC_KAT_VECTORS.items():
+        key = bytes(range(16))
+        for count, tag in vectors:
+            message = bytes(range(count - 1))
+            tag = bytes.fromhex(tag)
+            if asc.ascon_mac(key, message, variant, len(tag)) != tag:
+                failures.append((variant, count, "mac"))
+            if not asc.ascon_mac_verify(key, message, tag, variant):
+                failures.append((variant, count, "mac_verify"))
+            if asc.ascon_mac_verify(key, message, tag[:-1] + bytes([tag[-1] ^ 1]), variant):
+                failures.append((variant, count, "mac_verify (tampered tag)"))
+    return failures
+
+
+def benchmark(asc, iterations=200, sizes=PAYLOAD_SIZES):
+    """
+    Times one-shot encryption and decryption of random payloads.
+    returns a list of dicts with variant, operation, payload size, packets/s and us/byte
+    """
+    results = []
+    for variant in KAT_VECTORS:
+        keysize = 20 if variant == "Ascon-80pq" else 16
+        key = asc.key_context(asc.get_random_bytes(keysize))
+        nonce = asc.get_random_bytes(16)
+        for size in sizes:
+            plaintext = asc.get_random_bytes(size)
+            ciphertext = asc.ascon_encrypt(key, nonce, b"", plaintext, variant)
+            operations = {
+                "encrypt": lambda: asc.ascon_encrypt(key, nonce, b"", plaintext, variant),
+                "decrypt": lambda: asc.ascon_decrypt(key, nonce, b"", ciphertext, variant),
+            }
+            for operation, run in operations.items():
+                start = time.perf_counter()
+                for i in range(iterations):
+                    run()
+                elapsed = time.perf_counter() - start
+                results.append({
+                    "variant": variant,
+                    "operation": operation,
+                    "payload_bytes": size,
+                    "packets_per_second": round(iterations / elapsed, 1),
+                    "us_per_byte": round(elapsed * 1e6 / (iterations * size), 3),
+                })
+    return results
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    asc = ascon.Ascon()
+    failures = check_kat(asc)
+    if failures:
+        print(json.dumps({"kat": "failed", "failures": failures}, indent=2))
+        sys.exit(1)
+    print(json.dumps({"kat": "passed",
+                      "iterations": iterations,
+                      "results": benchmark(asc, iterations)}, indent=2))
@@ -8,7 +8,9 @@ IS_MICROPYTHON = (sys.implementation.name == 'micropython')
 IS_ESP8266 = (os.uname().sysname == 'esp8266')
 IS_ESP32 = (os.uname().sysname == 'esp32')
 IS_TTGO_LORA_OLED = None
-IS_RPi = not (IS_MICROPYTHON or IS_PC)
+# LORA_CONTROLLER=emulated: no radio hardware, see controller_emulated
+IS_EMULATED = not IS_MICROPYTHON and os.getenv('LORA_CONTROLLER') == 'emulated'
+IS_RPi = not (IS_MICROPYTHON or IS_PC or IS_EMULATED)
 
 
 def mac2eui(mac):
@@ -25,5 +27,18 @@ if IS_RPi:
     # millisecond
     def millisecond(): return time.time() * 1000
 
-    # Controller
+    # Controller, RPi.GPIO / spidev missing is an error: the emulator is
+    # only used when asked for
     from .controller_rpi import Controller
+
+if IS_EMULATED:
+
+    # Node Name
+    import socket
+    NODE_NAME = 'Emulated_' + socket.gethostname()
+
+    # millisecond
+    def millisecond(): return time.time() * 1000
+
+    # Controller
+    from .controller_emulated import Controller
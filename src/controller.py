@@ -1,5 +1,10 @@
 from time import sleep
 
+try:
+    import threading
+except ImportError:     # MicroPython
+    threading = None
+
 
 class Controller:
 
@@ -36,6 +41,9 @@ class Controller:
         self.pin_reset = self.prepare_pin(pin_id_reset)
         self.reset_pin(self.pin_reset)
         self.spi = self.prepare_spi(self.get_spi())
+        # the transceivers share the SPI bus: one chip-select cycle at a time,
+        # IRQ callback threads and the event loop may use different radios
+        self.spi_lock = threading.Lock() if threading else None
         self.transceivers = {}
         self.blink_led(*blink_on_start)
 
@@ -49,10 +57,13 @@ class Controller:
                         pin_id_CadDetected=PIN_ID_FOR_LORA_DIO4,
                         pin_id_PayloadCrcError=PIN_ID_FOR_LORA_DIO5):
 
-        transceiver.transfer = self.spi.transfer
+        transceiver.transfer = self.arbitrated(self.spi.transfer)
+        transceiver.transfer_burst = self.arbitrated(self.spi.transfer_burst)
+        transceiver.transfer_many = self.arbitrated(
+            getattr(self.spi, 'transfer_many', None) or self.transfer_each)
         transceiver.blink_led = self.blink_led
 
-        transceiver.pin_ss = self.prepare_pin(pin_id_ss)
+        transceiver.pin_ss = self.prepare_ss_pin(pin_id_ss)
         transceiver.pin_RxDone = self.prepare_irq_pin(pin_id_RxDone)
         transceiver.pin_RxTimeout = self.prepare_irq_pin(pin_id_RxTimeout)
         transceiver.pin_ValidHeader = self.prepare_irq_pin(pin_id_ValidHeader)
@@ -65,6 +76,26 @@ class Controller:
         self.transceivers[transceiver.name] = transceiver
         return transceiver
 
+    def arbitrated(self, transfer):
+        # wrap an SPI transfer function so it holds the bus lock
+        if self.spi_lock is None:
+            return transfer
+        lock = self.spi_lock
+
+        def locked_transfer(*args):
+            with lock:
+                return transfer(*args)
+        return locked_transfer
+
+    def transfer_each(self, pin_ss, pairs):
+        # transfer_many() of an SPI without one: a transfer per register
+        transfer = self.spi.transfer
+        return bytes(transfer(pin_ss, address, value)[-1] for address, value in pairs)
+
+    def prepare_ss_pin(self, pin_id):
+        # the chip select of a transceiver, a plain output pin by default
+        return self.prepare_pin(pin_id)
+
     def prepare_pin(self, pin_id, in_out=None):
         reason = '''
             # a pin should provide:
@@ -94,7 +125,10 @@ class Controller:
         reason = '''
             # a spi should provide: 
             # .close()
-            # .transfer(pin_ss, address, value = 0x00) 
+            # .transfer(pin_ss, address, value = 0x00)  # returns the byte read
+            # .transfer_burst(pin_ss, address, values)  # one chip-select cycle, returns len(values) bytes
+            # .transfer_many(pin_ss, pairs)  # optional: a chip-select cycle per (address, value),
+            #                                # in one bus transaction, returns a byte per pair
         '''
         raise NotImplementedError(reason)
 
@@ -0,0 +1,441 @@
+import threading
+from time import monotonic
+from . import controller
+
+
+# Hardware-free controller: implements the controller.Controller contract on
+# top of emulated SX127x chips (register file, FIFO, IRQ flags and DIO lines),
+# so the receive path can be run, profiled and benchmarked on any machine.
+# Select it with LORA_CONTROLLER=emulated (see config_lora), then feed
+# packets with controller.radio(name).inject(...).
+#
+# Each chip select pin gets its own emulated chip. IRQs are raised from a
+# timer thread, as RPi.GPIO calls its callbacks from its own thread.
+# time_scale stretches the time on air of TX, CAD and injected packets:
+# 1.0 is real time, 0 completes them as soon as possible.
+
+# registers / bits used by the emulation, as in sx127x
+REG_FIFO = 0x00
+REG_OP_MODE = 0x01
+REG_FRF_MSB = 0x06
+REG_FIFO_ADDR_PTR = 0x0d
+REG_FIFO_TX_BASE_ADDR = 0x0e
+REG_FIFO_RX_BASE_ADDR = 0x0f
+REG_FIFO_RX_CURRENT_ADDR = 0x10
+REG_IRQ_FLAGS = 0x12
+REG_RX_NB_BYTES = 0x13
+REG_MODEM_STAT = 0x18
+REG_PKT_SNR_VALUE = 0x19
+REG_PKT_RSSI_VALUE = 0x1a
+REG_HOP_CHANNEL = 0x1c
+REG_MODEM_CONFIG_1 = 0x1d
+REG_MODEM_CONFIG_2 = 0x1e
+REG_PREAMBLE_MSB = 0x20
+REG_PAYLOAD_LENGTH = 0x22
+REG_FIFO_RX_BYTE_ADDR = 0x25
+REG_FEI_MSB = 0x28
+REG_DIO_MAPPING_1 = 0x40
+
+MODE_MASK = 0x07
+MODE_STDBY = 0x01
+MODE_TX = 0x03
+MODE_RX_CONTINUOUS = 0x05
+MODE_RX_SINGLE = 0x06
+MODE_CAD = 0x07
+RX_MODES = (MODE_RX_CONTINUOUS, MODE_RX_SINGLE)
+
+IRQ_CAD_DETECTED = 0x01
+IRQ_CAD_DONE = 0x04
+IRQ_TX_DONE = 0x08
+IRQ_PAYLOAD_CRC_ERROR = 0x20
+IRQ_RX_DONE = 0x40
+
+FXOSC = 32E6
+BANDWIDTHS = (7.8E3, 10.4E3, 15.6E3, 20.8E3, 31.25E3, 41.7E3, 62.5E3, 125E3, 250E3, 500E3)
+
+# LoRa mode register values after reset (SX1276 datasheet, table 41)
+RESET_REGISTERS = {
+    REG_OP_MODE: 0x09, 0x06: 0x6c, 0x07: 0x80, 0x08: 0x00, 0x09: 0x4f, 0x0c: 0x20,
+    REG_FIFO_TX_BASE_ADDR: 0x80, REG_FIFO_RX_BASE_ADDR: 0x00,
+    REG_MODEM_CONFIG_1: 0x72, REG_MODEM_CONFIG_2: 0x70, 0x1f: 0x64, 0x21: 0x08,
+    REG_PAYLOAD_LENGTH: 0x01, 0x31: 0xc3, 0x37: 0x0a, 0x39: 0x12, 0x42: 0x12}
+
+
+class EmulatedPacket:
+
+    # a frame on the air, see EmulatedSX127x.inject()
+
+    def __init__(self, payload, rssi, snr, crc_error, fei, crc, coding_rate,
+                 frequency, spreading_factor, expires):
+        self.payload = bytes(payload)
+        self.rssi = rssi
+        self.snr = snr
+        self.crc_error = crc_error
+        self.fei = fei
+        self.crc = crc
+        self.coding_rate = coding_rate
+        self.frequency = frequency
+        self.spreading_factor = spreading_factor
+        self.expires = expires
+
+
+class EmulatedSX127x:
+
+    # register file, 256 byte FIFO and radio state machine of one SX127x
+
+    def __init__(self, time_scale=1.0, pending_timeout=1.0):
+        self.time_scale = time_scale
+        self.pending_timeout = pending_timeout
+        self.lock = threading.RLock()
+        self.dio = [None] * 6           # irq pins, set by Controller.add_transceiver
+        self.transmitted = []           # payloads sent by the driver
+        self.received = 0               # packets delivered to the FIFO
+        self.missed = 0                 # packets that found the radio elsewhere
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.registers = bytearray(128)
+            for address, value in RESET_REGISTERS.items():
+                self.registers[address] = value
+            self.fifo = bytearray(256)
+            self.rx_addr = 0
+            self.pending = []           # packets on other channels, for CAD
+
+    # -- SPI
+
+    def access(self, address, values):
+        # one chip-select cycle: address byte, then len(values) data bytes
+        response = bytearray(len(values))
+        with self.lock:
+            register = address & 0x7f
+            write = address & 0x80
+            for i, value in enumerate(values):
+                if register == REG_FIFO:
+                    pointer = self.registers[REG_FIFO_ADDR_PTR]
+                    if write:
+                        self.fifo[pointer] = value
+                    else:
+                        response[i] = self.fifo[pointer]
+                    self.registers[REG_FIFO_ADDR_PTR] = (pointer + 1) & 0xff
+                else:
+                    response[i] = self.registers[register]
+                    if write:
+                        self.write_register(register, value)
+                    register = (register + 1) & 0x7f
+        return response
+
+    def write_register(self, register, value):
+        if register == REG_IRQ_FLAGS:
+            # write 1 to clear
+            self.registers[register] &= ~value & 0xff
+        elif register == REG_OP_MODE:
+            previous = self.mode()
+            self.registers[register] = value
+            self.mode_changed(previous)
+        else:
+            self.registers[register] = value
+
+    # -- state
+
+    def mode(self):
+        return self.registers[REG_OP_MODE] & MODE_MASK
+
+    def set_mode(self, mode):
+        self.registers[REG_OP_MODE] = (self.registers[REG_OP_MODE] & ~MODE_MASK) | mode
+
+    def frequency(self):
+        frf = (self.registers[REG_FRF_MSB] << 16) | (self.registers[REG_FRF_MSB + 1] << 8) | \
+            self.registers[REG_FRF_MSB + 2]
+        return round(frf * FXOSC / (1 << 19))
+
+    def spreading_factor(self):
+        return self.registers[REG_MODEM_CONFIG_2] >> 4
+
+    def parameters(self):
+        # the modem settings in sx127x.SX127x.parameters form
+        config_1 = self.registers[REG_MODEM_CONFIG_1]
+        return {'frequency': self.frequency(),
+                'signal_bandwidth': BANDWIDTHS[min(config_1 >> 4, 9)],
+                'spreading_factor': self.spreading_factor(),
+                'coding_rate': 4 + ((config_1 >> 1) & 0x07),
+                'preamble_length': (self.registers[REG_PREAMBLE_MSB] << 8) | self.registers[REG_PREAMBLE_MSB + 1],
+                'implicitHeader': bool(config_1 & 0x01),
+                'enable_CRC': bool(self.registers[REG_MODEM_CONFIG_2] & 0x04)}
+
+    def time_on_air(self, payload_length):
+        from .sx127x import time_on_air
+        return time_on_air(payload_length, self.parameters())
+
+    def tuned_to(self, packet):
+        # within one Frf step (61 Hz) of the channel
+        return (packet.frequency is None or abs(packet.frequency - self.frequency()) < FXOSC / (1 << 19)) and \
+            (packet.spreading_factor is None or packet.spreading_factor == self.spreading_factor())
+
+    def mode_changed(self, previous):
+        mode = self.mode()
+        if mode in RX_MODES and previous not in RX_MODES:
+            # the demodulator writes from FifoRxBaseAddr on
+            self.rx_addr = self.registers[REG_FIFO_RX_BASE_ADDR]
+            if mode == MODE_RX_SINGLE:
+                # after a CAD: the detected packet is still on the air
+                for packet in self.pending_for_channel():
+                    self.pending.remove(packet)
+                    self.later(0, self.arrive, packet)
+                    break
+        elif mode == MODE_TX:
+            base = self.registers[REG_FIFO_TX_BASE_ADDR]
+            length = self.registers[REG_PAYLOAD_LENGTH]
+            payload = bytes(self.fifo[(base + i) & 0xff] for i in range(length))
+            self.later(self.time_on_air(length), self.tx_done, payload)
+        elif mode == MODE_CAD:
+            parameters = self.parameters()
+            symbol_time = 2**parameters['spreading_factor'] / parameters['signal_bandwidth']
+            self.later(2 * symbol_time, self.cad_done)
+
+    def pending_for_channel(self):
+        now = monotonic()
+        self.pending = [packet for packet in self.pending if packet.expires > now]
+        return [packet for packet in self.pending if self.tuned_to(packet)]
+
+    def later(self, seconds, function, *args):
+        # completes like the radio would, from another thread
+        timer = threading.Timer(seconds * self.time_scale, function, args)
+        timer.daemon = True
+        timer.start()
+
+    # -- events
+
+    def tx_done(self, payload):
+        with self.lock:
+            if self.mode() != MODE_TX:
+                return          # aborted
+            self.transmitted.append(payload)
+            self.registers[REG_IRQ_FLAGS] |= IRQ_TX_DONE
+            self.set_mode(MODE_STDBY)
+            dio0 = self.registers[REG_DIO_MAPPING_1] >> 6 == 1
+        if dio0:
+            self.raise_dio(0)
+
+    def cad_done(self):
+        with self.lock:
+            if self.mode() != MODE_CAD:
+                return
+            flags = IRQ_CAD_DONE
+            if self.pending_for_channel():
+                flags |= IRQ_CAD_DETECTED
+            self.registers[REG_IRQ_FLAGS] |= flags
+            self.set_mode(MODE_STDBY)
+            mapping = self.registers[REG_DIO_MAPPING_1]
+        if mapping >> 6 == 2:
+            self.raise_dio(0)
+        if mapping & 0x03 == 0:
+            self.raise_dio(3)
+        if flags & IRQ_CAD_DETECTED:
+            self.raise_dio(4)
+
+    def inject(self, payload, rssi=-60, snr=9.5, crc_error=False, fei=0, crc=None,
+               coding_rate=None, frequency=None, spreading_factor=None, delay=0):
+        # put a packet on the air, received after delay (scaled) seconds.
+        # frequency / spreading_factor: the channel it is sent on, None for
+        # whatever the radio listens to. A packet on another channel can still
+        # be found by a CAD on its channel within pending_timeout seconds.
+        # crc: the header announces a payload CRC (default: as configured),
+        # coding_rate: header coding rate denominator (default: as configured).
+        packet = EmulatedPacket(payload, rssi, snr, crc_error, fei, crc, coding_rate,
+                                frequency, spreading_factor, 0)
+        self.later(delay, self.arrive, packet)
+        return packet
+
+    def arrive(self, packet):
+        with self.lock:
+            if self.mode() in RX_MODES and self.tuned_to(packet):
+                self.receive(packet)
+                dio0 = self.registers[REG_DIO_MAPPING_1] >> 6 == 0
+            else:
+                packet.expires = monotonic() + self.pending_timeout
+                self.pending.append(packet)
+                self.missed += 1
+                dio0 = False
+        if dio0:
+            self.raise_dio(0)
+
+    def receive(self, packet):
+        registers = self.registers
+        config_1 = registers[REG_MODEM_CONFIG_1]
+        payload = packet.payload
+        if config_1 & 0x01:
+            # implicit header: the receiver expects REG_PAYLOAD_LENGTH bytes
+            payload = payload[:registers[REG_PAYLOAD_LENGTH]].ljust(registers[REG_PAYLOAD_LENGTH], b'\0')
+
+        start = self.rx_addr
+        for i, value in enumerate(payload):
+            self.fifo[(start + i) & 0xff] = value
+        self.rx_addr = (start + len(payload)) & 0xff
+        registers[REG_FIFO_RX_CURRENT_ADDR] = start
+        registers[REG_FIFO_RX_BYTE_ADDR] = (self.rx_addr - 1) & 0xff
+        registers[REG_RX_NB_BYTES] = len(payload)
+
+        # packet status, see sx127x.SX127x.read_packet_info(), with its RSSI offset
+        offset = 164 if self.frequency() < 868E6 else 157
+        snr = int(round(packet.snr * 4))
+        registers[REG_PKT_SNR_VALUE] = snr & 0xff
+        rssi = packet.rssi + offset - (packet.snr if packet.snr < 0 else 0)
+        registers[REG_PKT_RSSI_VALUE] = min(max(int(round(rssi)), 0), 255)
+        coding_rate = packet.coding_rate or 4 + ((config_1 >> 1) & 0x07)
+        registers[REG_MODEM_STAT] = ((coding_rate - 4) << 5) | 0x01
+        crc = bool(registers[REG_MODEM_CONFIG_2] & 0x04) if packet.crc is None else packet.crc
+        registers[REG_HOP_CHANNEL] = 0x40 if crc else 0x00
+        bandwidth = BANDWIDTHS[min(config_1 >> 4, 9)]
+        fei = int(round(packet.fei / ((1 << 24) / FXOSC * (bandwidth / 500E3)))) & 0xfffff
+        registers[REG_FEI_MSB:REG_FEI_MSB + 3] = bytes((fei >> 16, (fei >> 8) & 0xff, fei & 0xff))
+
+        registers[REG_IRQ_FLAGS] |= IRQ_RX_DONE | (IRQ_PAYLOAD_CRC_ERROR if packet.crc_error else 0)
+        if self.mode() == MODE_RX_SINGLE:
+            self.set_mode(MODE_STDBY)
+        self.received += 1
+
+    def raise_dio(self, index):
+        pin = self.dio[index]
+        if pin is not None and pin.handler is not None:
+            pin.handler(pin.pin_id)
+
+
+class EmulatedSpi:
+
+    # the shared SPI bus: one emulated chip per chip select pin
+
+    def __init__(self, time_scale=1.0):
+        self.time_scale = time_scale
+        self.chips = {}
+        self.transactions = 0
+        self.bytes = 0
+
+    def chip(self, pin_id):
+        chip = self.chips.get(pin_id)
+        if chip is None:
+            chip = self.chips[pin_id] = EmulatedSX127x(self.time_scale)
+        return chip
+
+    def xfer(self, pin_ss, address, values):
+        self.transactions += 1
+        self.bytes += 1 + len(values)
+        return self.chip(pin_ss.pin_id).access(address, values)
+
+    def xfer_many(self, pin_ss, pairs):
+        # one transaction, a chip-select cycle per (address, value)
+        self.transactions += 1
+        self.bytes += 2 * len(pairs)
+        chip = self.chip(pin_ss.pin_id)
+        return bytes(chip.access(address, (value,))[0] for address, value in pairs)
+
+    def close(self):
+        pass
+
+
+class Controller(controller.Controller):
+
+    # same pins as controller_rpi, so a configuration runs unchanged
+
+    ON_BOARD_LED_PIN_NO = 23
+    ON_BOARD_LED_HIGH_IS_ON = True
+    GPIO_PINS = tuple(range(2, 28))
+
+    PIN_ID_FOR_LORA_RESET = 6
+
+    PIN_ID_FOR_LORA_SS = 25
+    PIN_ID_SCK = 11
+    PIN_ID_MOSI = 10
+    PIN_ID_MISO = 9
+
+    PIN_ID_FOR_LORA_DIO0 = 17
+    PIN_ID_FOR_LORA_DIO1 = None
+    PIN_ID_FOR_LORA_DIO2 = None
+    PIN_ID_FOR_LORA_DIO3 = None
+    PIN_ID_FOR_LORA_DIO4 = None
+    PIN_ID_FOR_LORA_DIO5 = None
+
+    def __init__(self, pin_id_led=ON_BOARD_LED_PIN_NO,
+                 on_board_led_high_is_on=ON_BOARD_LED_HIGH_IS_ON,
+                 pin_id_reset=PIN_ID_FOR_LORA_RESET, blink_on_start=(0, 0, 0),
+                 time_scale=1.0):
+
+        self.time_scale = time_scale
+        self.blinks = 0
+        super().__init__(
+            pin_id_led,
+            on_board_led_high_is_on,
+            pin_id_reset,
+            blink_on_start
+        )
+
+    def add_transceiver(self, transceiver, *args, **kwargs):
+        super().add_transceiver(transceiver, *args, **kwargs)
+        # wire the DIO pins to the chip behind this chip select
+        chip = self.spi_bus.chip(transceiver.pin_ss.pin_id)
+        chip.dio = [transceiver.pin_RxDone, transceiver.pin_RxTimeout,
+                    transceiver.pin_ValidHeader, transceiver.pin_CadDone,
+                    transceiver.pin_CadDetected, transceiver.pin_PayloadCrcError]
+        return transceiver
+
+    def radio(self, name):
+        # the emulated chip of a transceiver, to inject packets into
+        return self.spi_bus.chip(self.transceivers[name].pin_ss.pin_id)
+
+    def prepare_pin(self, pin_id, in_out=None):
+        if pin_id is not None:
+            new_pin = Controller.Mock()
+            new_pin.pin_id = pin_id
+            new_pin.level = 0
+
+            def set_level(level):
+                new_pin.level = level
+            new_pin.low = lambda: set_level(0)
+            new_pin.high = lambda: set_level(1)
+            new_pin.value = lambda: new_pin.level
+
+            return new_pin
+
+    def prepare_irq_pin(self, pin_id):
+        pin = self.prepare_pin(pin_id)
+        if pin:
+            pin.handler = None
+
+            def set_handler(handler):
+                pin.handler = handler
+
+            def detach_irq():
+                pin.handler = None
+            pin.set_handler_for_irq_on_rising_edge = set_handler
+            pin.detach_irq = detach_irq
+            return pin
+
+    def get_spi(self):
+        self.spi_bus = EmulatedSpi(self.time_scale)
+        return self.spi_bus
+
+    def prepare_spi(self, spi):
+        if spi:
+            new_spi = Controller.Mock()
+
+            def transfer(pin_ss, address, value=0x00):
+                return spi.xfer(pin_ss, address, (value,))
+
+            def transfer_burst(pin_ss, address, values):
+                return spi.xfer(pin_ss, address, values)
+
+            def transfer_many(pin_ss, pairs):
+                return spi.xfer_many(pin_ss, pairs)
+
+            new_spi.transfer = transfer
+            new_spi.transfer_burst = transfer_burst
+            new_spi.transfer_many = transfer_many
+            new_spi.close = spi.close
+            return new_spi
+
+    def blink_led(self, times=1, on_seconds=0.1, off_seconds=0.1):
+        # no LED to wait for
+        self.blinks += times
+
+    def __exit__(self):
+        self.spi.close()
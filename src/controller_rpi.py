@@ -1,11 +1,33 @@
 import RPi.GPIO as GPIO
 import spidev
+import ctypes
+import fcntl
 from . import controller
 from time import sleep
 
 
 GPIO.setmode(GPIO.BCM)
 
+
+# linux/spi/spidev.h: one segment of an SPI_IOC_MESSAGE
+class SpiIocTransfer(ctypes.Structure):
+    _fields_ = [('tx_buf', ctypes.c_uint64),
+                ('rx_buf', ctypes.c_uint64),
+                ('len', ctypes.c_uint32),
+                ('speed_hz', ctypes.c_uint32),
+                ('delay_usecs', ctypes.c_uint16),
+                ('bits_per_word', ctypes.c_uint8),
+                ('cs_change', ctypes.c_uint8),
+                ('tx_nbits', ctypes.c_uint8),
+                ('rx_nbits', ctypes.c_uint8),
+                ('word_delay_usecs', ctypes.c_uint8),
+                ('pad', ctypes.c_uint8)]
+
+
+def spi_ioc_message(count):
+    # _IOW('k', 0, char[SPI_MSGSIZE(count)])
+    return 0x40000000 | (count * ctypes.sizeof(SpiIocTransfer)) << 16 | ord('k') << 8
+
 # try:
 #     GPIO.cleanup()
 # except Exception as e:
@@ -24,6 +46,12 @@ class Controller(controller.Controller):
     PIN_ID_FOR_LORA_RESET = 6
 
     PIN_ID_FOR_LORA_SS = 25
+    # hardware chip selects of SPI0, driven by spidev: a transceiver with its
+    # NSS on CE0 / CE1 needs no GPIO toggles. Transfers to a transceiver with
+    # a GPIO chip select go through spidev0.0 and assert CE0 as well, so next
+    # to one of those the second transceiver belongs on CE1 (prepare_ss_pin
+    # refuses CE0 then).
+    CHIP_SELECT_PINS = {8: 0, 7: 1}
     PIN_ID_SCK = 11
     PIN_ID_MOSI = 10
     PIN_ID_MISO = 9
@@ -41,6 +69,10 @@ class Controller(controller.Controller):
                      2, 0.5, 0.5)
                  ):
 
+        # spidev devices by hardware chip select, see prepare_ss_pin()
+        self.spi_devices = {}
+        # chip select pins of the transceivers added so far
+        self.ss_pin_ids = []
         super().__init__(
             pin_id_led,
             on_board_led_high_is_on,
@@ -72,13 +104,32 @@ class Controller(controller.Controller):
             pin.detach_irq = lambda: GPIO.remove_event_detect(pin.pin_id)
             return pin
 
-    def get_spi(self):
+    def prepare_ss_pin(self, pin_id):
+        device = self.CHIP_SELECT_PINS.get(pin_id)
+        # a GPIO chip select transfer asserts CE0 too, selecting both radios
+        gpio = [ss for ss in self.ss_pin_ids + [pin_id] if ss not in self.CHIP_SELECT_PINS]
+        ce0 = [ss for ss in self.ss_pin_ids + [pin_id] if self.CHIP_SELECT_PINS.get(ss) == 0]
+        if gpio and ce0:
+            raise Exception('Chip select on GPIO{} shares CE0 (GPIO{}), use CE1 (GPIO7).'.format(
+                gpio[0], ce0[0]))
+        self.ss_pin_ids.append(pin_id)
+        if device is None:
+            return self.prepare_pin(pin_id)
+        # no GPIO.setup, the pin belongs to the SPI controller
+        new_pin = Controller.Mock()
+        new_pin.pin_id = pin_id
+        new_pin.spi = self.spi_devices.get(device) or self.get_spi(device)
+        if new_pin.spi is None:
+            raise Exception('No SPI device for CE{}.'.format(device))
+        self.spi_devices[device] = new_pin.spi
+        return new_pin
+
+    def get_spi(self, device=0):
         spi = None
 
         try:
             spi = spidev.SpiDev()
             bus = 0
-            device = 0
             spi.open(bus, device)
             spi.max_speed_hz = 10000000
             spi.mode = 0b00
@@ -98,17 +149,64 @@ class Controller(controller.Controller):
     def prepare_spi(self, spi):
         if spi:
             new_spi = Controller.Mock()
+            self.spi_devices[0] = spi
 
+            # a pin_ss on CE0 / CE1 carries its spidev device, spidev asserts
+            # the chip select; otherwise it is toggled through RPi.GPIO
             def transfer(pin_ss, address, value=0x00):
-                response = bytearray(1)
+                device = getattr(pin_ss, 'spi', None)
+                if device is not None:
+                    return bytes(device.xfer2([address, value])[1:])
+
+                pin_ss.low()
+                response = spi.xfer2([address, value])
+                pin_ss.high()
+
+                return bytes(response[1:])
+
+            # burst access: the address byte followed by len(values) bytes in a
+            # single chip-select cycle. The SX127x auto-increments its FIFO
+            # pointer, so this reads / writes a run of FIFO bytes in one go.
+            def transfer_burst(pin_ss, address, values):
+                device = getattr(pin_ss, 'spi', None)
+                if device is not None:
+                    return bytearray(device.xfer2([address] + list(values))[1:])
 
                 pin_ss.low()
-                response.append(spi.xfer2([address, value])[1])
+                response = spi.xfer2([address] + list(values))
                 pin_ss.high()
 
-                return response
+                return bytearray(response[1:])
+
+            # register sequence: a chip-select cycle per (address, value) pair,
+            # all in one SPI_IOC_MESSAGE ioctl on a hardware chip select
+            # (cs_change releases it between the segments)
+            def transfer_many(pin_ss, pairs):
+                device = getattr(pin_ss, 'spi', None)
+                if device is None:
+                    return bytes(transfer(pin_ss, address, value)[0] for address, value in pairs)
+
+                count = len(pairs)
+                tx = (ctypes.c_uint8 * (2 * count))()
+                rx = (ctypes.c_uint8 * (2 * count))()
+                segments = (SpiIocTransfer * count)()
+                tx_address = ctypes.addressof(tx)
+                rx_address = ctypes.addressof(rx)
+                for i, (address, value) in enumerate(pairs):
+                    tx[2 * i] = address
+                    tx[2 * i + 1] = value
+                    segment = segments[i]
+                    segment.tx_buf = tx_address + 2 * i
+                    segment.rx_buf = rx_address + 2 * i
+                    segment.len = 2
+                    segment.cs_change = i < count - 1
+                fcntl.ioctl(device.fileno(), spi_ioc_message(count), segments)
+
+                return bytes(rx[1::2])
 
             new_spi.transfer = transfer
+            new_spi.transfer_burst = transfer_burst
+            new_spi.transfer_many = transfer_many
             new_spi.close = spi.close
             return new_spi
 
@@ -127,3 +225,6 @@ class Controller(controller.Controller):
     def __exit__(self):
         GPIO.cleanup()
         self.spi.close()
+        for device, spi in self.spi_devices.items():
+            if device:
+                spi.close()
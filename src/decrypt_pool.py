@@ -0,0 +1,85 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from . import ascon
+
+
+# Decryption stage for multi-core gateways: packets are decrypted in small
+# batches by worker processes, so the radio loop only queues ciphertexts.
+# Results come back in submission order, which keeps the order per node.
+# batch_size is an upper bound, a batch is also sent once the receive loop
+# waits for the radio again. Measured with 2 workers, bursts of 32 packets:
+# up to 16 per batch the IPC costs more than decrypting inline, 32 is the
+# fastest (ascon_decrypt_many only takes NumPy lanes from MIN_LANES on).
+
+# per worker process, set by init_worker
+worker_ascon = None
+worker_key = None
+
+
+def init_worker(key):
+    global worker_ascon, worker_key
+    worker_ascon = ascon.Ascon()
+    worker_key = worker_ascon.key_context(key)
+
+
+def decrypt_batch(nonces, ciphertexts, associateddata, variants):
+    # runs in a worker process, returns the plaintext (or None) per packet
+    plaintexts = [None] * len(ciphertexts)
+    for variant in set(variants):
+        lanes = [i for i, v in enumerate(variants) if v == variant]
+        variant_plaintexts, valid = worker_ascon.ascon_decrypt_many(
+            worker_key, [nonces[i] for i in lanes], [ciphertexts[i] for i in lanes],
+            variant, [associateddata[i] for i in lanes])
+        for i, plaintext in zip(lanes, variant_plaintexts):
+            plaintexts[i] = plaintext
+    return plaintexts
+
+
+class DecryptionPool:
+
+    def __init__(self, key, workers=2, batch_size=32):
+        self.batch_size = batch_size
+        self.executor = ProcessPoolExecutor(max_workers=workers,
+                                            initializer=init_worker,
+                                            initargs=(bytes(key),))
+        self._batch = []
+        self._pending = asyncio.Queue()
+
+    def submit(self, nonce, ciphertext, context=None, associateddata=b"", variant="Ascon-128"):
+        # queue one packet, context is handed back together with its plaintext
+        self._batch.append((bytes(nonce), bytes(ciphertext),
+                            bytes(associateddata), variant, context))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+        elif len(self._batch) == 1:
+            # runs once the receive loop waits for the radio again
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self):
+        # send the queued packets to a worker
+        if self._batch:
+            batch = self._batch
+            self._batch = []
+            future = asyncio.get_running_loop().run_in_executor(
+                self.executor, decrypt_batch,
+                [nonce for nonce, _, _, _, _ in batch],
+                [ciphertext for _, ciphertext, _, _, _ in batch],
+                [associateddata for _, _, associateddata, _, _ in batch],
+                [variant for _, _, _, variant, _ in batch])
+            self._pending.put_nowait(
+                (future, [context for _, _, _, _, context in batch]))
+
+    async def results(self):
+        # yields (context, plaintext or None) in submission order
+        while True:
+            future, contexts = await self._pending.get()
+            try:
+                plaintexts = await future
+            except Exception as e:
+                print(e)
+                plaintexts = [None] * len(contexts)
+            for context, plaintext in zip(contexts, plaintexts):
+                yield context, plaintext
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
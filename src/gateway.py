@@ -0,0 +1,57 @@
+import asyncio
+
+
+# Multi-radio gateway: several SX127x on one controller (shared SPI bus, own
+# chip select and DIO0 pin each), e.g. on different frequencies or spreading
+# factors. Every radio runs its own interrupt driven receive task and the
+# packets of all of them are merged into one stream, in arrival order.
+# A radio configured with cad_channels serves those channels by CAD scanning
+# (SX127x.scan()), the others stay in RX continuous on their own channel.
+# The controller serialises the SPI transactions of the radios.
+
+
+async def radio_packets(transceiver, buffer=None):
+    # yields the PacketInfo of every packet one radio receives
+    if transceiver.cad_channels:
+        receiving = transceiver.scan(transceiver.cad_channels, buffer=buffer, info=True)
+    else:
+        receiving = transceiver.packets(buffer=buffer, info=True)
+    try:
+        async for packet in receiving:
+            yield packet[1] if transceiver.cad_channels else packet
+    finally:
+        # back to standby / IRQs detached now, not when garbage collected
+        await receiving.aclose()
+
+
+async def merged_packets(transceivers, buffer=None, maxsize=64):
+    # yields (transceiver, PacketInfo). With a single radio its packets are
+    # passed straight through and buffer is reused as in SX127x.packets();
+    # with several, each packet is copied so the radios can go on receiving.
+    if len(transceivers) == 1:
+        transceiver = transceivers[0]
+        async for packet in radio_packets(transceiver, buffer):
+            yield transceiver, packet
+        return
+
+    queue = asyncio.Queue(maxsize)
+
+    async def receive(transceiver):
+        async for packet in radio_packets(transceiver):
+            await queue.put((transceiver, packet))
+
+    def report(task):
+        if not task.cancelled() and task.exception():
+            print('{}: {}'.format(task.get_name(), task.exception()))
+
+    tasks = []
+    for transceiver in transceivers:
+        task = asyncio.create_task(receive(transceiver), name=transceiver.name)
+        task.add_done_callback(report)
+        tasks.append(task)
+    try:
+        while True:
+            yield await queue.get()
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -1,7 +1,19 @@
 from time import sleep
+import asyncio
 import gc
+import math
 from . import config_lora
 
+try:
+    from time import monotonic
+except ImportError:     # MicroPython
+    from time import time as monotonic
+
+try:
+    import threading
+except ImportError:     # MicroPython
+    threading = None
+
 
 PA_OUTPUT_RFO_PIN = 0
 PA_OUTPUT_PA_BOOST_PIN = 1
@@ -27,20 +39,27 @@ REG_FIFO_RX_CURRENT_ADDR = 0x10
 REG_IRQ_FLAGS_MASK = 0x11
 REG_IRQ_FLAGS = 0x12
 REG_RX_NB_BYTES = 0x13
+REG_MODEM_STAT = 0x18
+REG_PKT_SNR_VALUE = 0x19
 REG_PKT_RSSI_VALUE = 0x1a
-REG_PKT_SNR_VALUE = 0x1b
+REG_HOP_CHANNEL = 0x1c
 REG_MODEM_CONFIG_1 = 0x1d
 REG_MODEM_CONFIG_2 = 0x1e
+REG_SYMB_TIMEOUT_LSB = 0x1f
 REG_PREAMBLE_MSB = 0x20
 REG_PREAMBLE_LSB = 0x21
 REG_PAYLOAD_LENGTH = 0x22
 REG_FIFO_RX_BYTE_ADDR = 0x25
 REG_MODEM_CONFIG_3 = 0x26
+REG_FEI_MSB = 0x28
+REG_FEI_MID = 0x29
+REG_FEI_LSB = 0x2a
 REG_RSSI_WIDEBAND = 0x2c
 REG_DETECTION_OPTIMIZE = 0x31
 REG_DETECTION_THRESHOLD = 0x37
 REG_SYNC_WORD = 0x39
 REG_DIO_MAPPING_1 = 0x40
+REG_DIO_MAPPING_2 = 0x41
 REG_VERSION = 0x42
 
 # modes
@@ -50,25 +69,104 @@ MODE_STDBY = 0x01
 MODE_TX = 0x03
 MODE_RX_CONTINUOUS = 0x05
 MODE_RX_SINGLE = 0x06
+MODE_CAD = 0x07
 
 # PA config
 PA_BOOST = 0x80
 
+DEFAULT_PARAMETERS = {'frequency': 433E6, 'tx_power_level': 2, 'signal_bandwidth': 125E3,
+                      'spreading_factor': 8, 'coding_rate': 5, 'preamble_length': 8,
+                      'implicitHeader': False, 'sync_word': 0x12, 'enable_CRC': False,
+                      'payload_length': 0}
+# payload_length: the fixed frame length received with implicitHeader, no
+# LoRa header on air (frames of another length are cut or padded by the radio)
+
+# DIO0 mapping (REG_DIO_MAPPING_1 bits 7-6), with DIO1 => RxTimeout and
+# DIO3 => CadDone (bits 5-0 left at 0); DIO4 => CadDetected is REG_DIO_MAPPING_2 0
+DIO0_RX_DONE = 0x00
+DIO0_TX_DONE = 0x40
+DIO0_CAD_DONE = 0x80
+
 # IRQ masks
+IRQ_CAD_DETECTED_MASK = 0x01
+IRQ_CAD_DONE_MASK = 0x04
 IRQ_TX_DONE_MASK = 0x08
 IRQ_PAYLOAD_CRC_ERROR_MASK = 0x20
 IRQ_RX_DONE_MASK = 0x40
 IRQ_RX_TIME_OUT_MASK = 0x80
 
+# packet status (REG_MODEM_STAT .. REG_FEI_LSB), read with one burst
+PACKET_STATUS_LENGTH = REG_FEI_LSB - REG_MODEM_STAT + 1
+FXOSC = 32E6
+
 # Buffer size
 MAX_PKT_LENGTH = 255
+FIFO_SIZE = 256     # the FIFO address pointers wrap around at 0xff
+
+# configuration registers mirrored by the optional shadow register file.
+# They only change when written, except REG_OP_MODE which the radio changes on
+# RX_DONE / RX_TIMEOUT / TX_DONE, so that one is dropped when those IRQs fire.
+# Volatile registers (IRQ flags, FIFO pointers, RSSI, ...) always hit the chip.
+SHADOWED_REGISTERS = frozenset((
+    REG_OP_MODE, REG_FRF_MSB, REG_FRF_MID, REG_FRF_LSB, REG_PA_CONFIG, REG_LNA,
+    REG_FIFO_TX_BASE_ADDR, REG_FIFO_RX_BASE_ADDR, REG_IRQ_FLAGS_MASK,
+    REG_MODEM_CONFIG_1, REG_MODEM_CONFIG_2, REG_MODEM_CONFIG_3,
+    REG_PREAMBLE_MSB, REG_PREAMBLE_LSB, REG_PAYLOAD_LENGTH,
+    REG_DETECTION_OPTIMIZE, REG_DETECTION_THRESHOLD, REG_SYNC_WORD,
+    REG_DIO_MAPPING_1, REG_VERSION))
+IRQ_MODE_CHANGE_MASK = IRQ_TX_DONE_MASK | IRQ_RX_DONE_MASK | IRQ_RX_TIME_OUT_MASK | IRQ_CAD_DONE_MASK
+
+# TX_DONE polling period once the estimated time on air has passed
+TX_POLL_INTERVAL = 0.001
+
+# garbage collection policies, see SX127x.set_gc_policy()
+GC_ALWAYS = 'always'
+GC_NONE = 'none'
+GC_GENERATIONAL = 'generational'
+GC_PERIODIC = 'periodic'
+GC_POLICIES = (GC_ALWAYS, GC_NONE, GC_GENERATIONAL, GC_PERIODIC)
+
+
+def time_on_air(payload_length, parameters):
+    # seconds on air of a LoRa frame (Semtech SX1276 datasheet, 4.1.1.7)
+    sf = parameters['spreading_factor']
+    bw = parameters['signal_bandwidth']
+    symbol_time = 2**sf / bw
+    # LowDataRateOptimize, enabled by init() when a symbol lasts > 16 ms
+    de = 1 if symbol_time > 0.016 else 0
+    ih = 1 if parameters['implicitHeader'] else 0
+    crc = 1 if parameters['enable_CRC'] else 0
+    payload_symbols = 8 + max(
+        math.ceil((8 * payload_length - 4 * sf + 28 + 16 * crc - 20 * ih) / (4 * (sf - 2 * de)))
+        * parameters['coding_rate'], 0)
+    return (parameters['preamble_length'] + 4.25 + payload_symbols) * symbol_time
+
+
+def on_event_loop():
+    # whether the calling thread is running an asyncio event loop
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+async def wait_event(event, timeout):
+    # wait for an IRQ event for at most timeout seconds, then clear it.
+    # Unlike asyncio.wait_for, a cancellation racing with the timeout is never lost.
+    handle = asyncio.get_running_loop().call_later(timeout, event.set)
+    try:
+        await event.wait()
+    finally:
+        handle.cancel()
+    event.clear()
 
 
 class SX127x:
 
     # The controller can be ESP8266, ESP32, Raspberry Pi, or a PC.
     # The controller needs to provide an interface consisted of:
-    # 1. a SPI, with transfer function.
+    # 1. a SPI, with transfer and transfer_burst functions.
     # 2. a reset pin, with low(), high() functions.
     # 3. IRQ pinS , to be triggered by RFM96W's DIO0~5 pins. These pins each has two functions:
     #   3.1 set_handler_for_irq_on_rising_edge()
@@ -77,20 +175,54 @@ class SX127x:
 
     def __init__(self,
                  name='SX127x',
-                 parameters={'frequency': 433E6, 'tx_power_level': 2, 'signal_bandwidth': 125E3,
-                             'spreading_factor': 8, 'coding_rate': 5, 'preamble_length': 8,
-                             'implicitHeader': False, 'sync_word': 0x12, 'enable_CRC': False},
-                 onReceive=None):
+                 parameters=DEFAULT_PARAMETERS,
+                 onReceive=None,
+                 shadow_registers=False,
+                 gc_policy=None,
+                 buffer_pool=None,
+                 cad_channels=None):
 
         self.name = name
         self.parameters = parameters
         self._onReceive = onReceive
-        self._lock = False
+        # guards FIFO and TX access against the RPi.GPIO callback thread.
+        # MicroPython is single threaded, doesn't need lock.
+        self._lock = None if config_lora.IS_MICROPYTHON or threading is None else threading.Lock()
+        # RX continuous: payload size to resume with after TX (None when not
+        # receiving), the FIFO address where the next packet will start and
+        # where the last one read started
+        self._rx_size = None
+        self._rx_armed = False
+        self._fifo_rx_next = FifoRxBaseAddr
+        self._fifo_rx_last = None
+        self._rx_irq_next = None
+        # overtaken packets dropped by pending_payloads(), and their bytes
+        self.rx_overruns = 0
+        self.rx_dropped_bytes = 0
+        # payload length set for implicit header RX (0: explicit header), and
+        # the one packets() / scan() receive with, see set_frame_length()
+        self._rx_length = 0
+        self.frame_length = parameters.get('payload_length', 0) if parameters['implicitHeader'] else 0
+        # IRQ pin -> (loop, asyncio.Event) pairs woken on its rising edges
+        self._irq_events = {}
+        # opt-in shadow register file: address -> last value read or written
+        self._shadow = {} if shadow_registers else None
+        # read_payload() hands out buffers from this PayloadBufferPool if given
+        self.buffer_pool = buffer_pool
+        self._payload_buffer = bytearray(MAX_PKT_LENGTH)
+        # (frequency, spreading_factor) channels the gateway serves with this
+        # radio through scan(), None for RX continuous on its own channel
+        self.cad_channels = [tuple(channel) for channel in cad_channels] if cad_channels else None
+        self.set_gc_policy(gc_policy)
 
     def init(self, parameters=None):
         if parameters:
             self.parameters = parameters
 
+        # (re)read the chip state
+        if self._shadow is not None:
+            self._shadow.clear()
+
         # check version
         version = self.readRegister(REG_VERSION)
         if version != 0x12:
@@ -111,7 +243,8 @@ class SX127x:
 
         self.setTxPower(self.parameters['tx_power_level'])
         self._implicitHeaderMode = None
-        self.implicitHeaderMode(self.parameters['implicitHeader'])
+        self.frame_length = self.parameters.get('payload_length', 0) if self.parameters['implicitHeader'] else 0
+        self._set_rx_length(self.frame_length)
         self.setSpreadingFactor(self.parameters['spreading_factor'])
         self.setCodingRate(self.parameters['coding_rate'])
         self.setPreambleLength(self.parameters['preamble_length'])
@@ -123,10 +256,11 @@ class SX127x:
         if 1000 / (self.parameters['signal_bandwidth'] / 2**self.parameters['spreading_factor']) > 16:
             self.writeRegister(REG_MODEM_CONFIG_3,
                                self.readRegister(REG_MODEM_CONFIG_3) | 0x08)
+        self._ldro = None
 
         # set base addresses
-        self.writeRegister(REG_FIFO_TX_BASE_ADDR, FifoTxBaseAddr)
-        self.writeRegister(REG_FIFO_RX_BASE_ADDR, FifoRxBaseAddr)
+        self.writeRegisters(((REG_FIFO_TX_BASE_ADDR, FifoTxBaseAddr),
+                             (REG_FIFO_RX_BASE_ADDR, FifoRxBaseAddr)))
 
         self.standby()
 
@@ -135,22 +269,101 @@ class SX127x:
         self.implicitHeaderMode(implicitHeaderMode)
 
         # reset FIFO address and paload length
-        self.writeRegister(REG_FIFO_ADDR_PTR, FifoTxBaseAddr)
-        self.writeRegister(REG_PAYLOAD_LENGTH, 0)
+        self.writeRegisters(((REG_FIFO_ADDR_PTR, FifoTxBaseAddr), (REG_PAYLOAD_LENGTH, 0)))
+
+    def endPacket(self, timeout=None):
+        airtime = self.time_on_air(self.readRegister(REG_PAYLOAD_LENGTH), self._implicitHeaderMode)
+        if timeout is None:
+            timeout = 2 * airtime + 1
 
-    def endPacket(self):
         # put in TX mode
         self.writeRegister(REG_OP_MODE, MODE_LONG_RANGE_MODE | MODE_TX)
 
-        # wait for TX done, standby automatically on TX_DONE
-        while (self.readRegister(REG_IRQ_FLAGS) & IRQ_TX_DONE_MASK) == 0:
-            pass
-
-        # clear IRQ's
-        self.writeRegister(REG_IRQ_FLAGS, IRQ_TX_DONE_MASK)
+        try:
+            # wait for TX done, standby automatically on TX_DONE.
+            # Sleep through the time on air instead of spinning on the SPI bus.
+            waited = min(airtime, timeout)
+            sleep(waited)
+            while (self.readRegister(REG_IRQ_FLAGS) & IRQ_TX_DONE_MASK) == 0:
+                if waited >= timeout:
+                    self.standby()
+                    raise TimeoutError('{}: no TX_DONE after {:.3f}s'.format(self.name, waited))
+                sleep(TX_POLL_INTERVAL)
+                waited += TX_POLL_INTERVAL
+
+            # clear IRQ's
+            self.writeRegister(REG_IRQ_FLAGS, IRQ_TX_DONE_MASK)
+            self.invalidate_op_mode()
+        finally:
+            # back to RX continuous if we were receiving
+            if self._rx_size is not None:
+                self.receive(self._rx_size)
 
         self.collect_garbage()
 
+    def time_on_air(self, payload_length, implicitHeader=None, spreading_factor=None):
+        # estimated from self.parameters, see time_on_air(); implicitHeader
+        # overrides the configured header mode, e.g. for a fixed-length frame,
+        # spreading_factor the configured one, e.g. for another channel
+        parameters = self.parameters
+        if implicitHeader is not None:
+            parameters = dict(parameters, implicitHeader=implicitHeader)
+        if spreading_factor is not None:
+            parameters = dict(parameters, spreading_factor=spreading_factor)
+        return time_on_air(payload_length, parameters)
+
+    async def transmit(self, data, implicitHeader=False, timeout=None, channel=None):
+        # asyncio counterpart of println for bytes: the event loop keeps running
+        # while the frame is on air, DIO0 (mapped to TxDone) wakes it up.
+        # channel: (frequency, spreading_factor) to send on, e.g. the one a
+        # node was heard on by scan(), the radio is tuned back afterwards.
+        # Returns the estimated time on air, raises TimeoutError if TX_DONE
+        # does not come within timeout seconds (default: twice the time on air).
+        loop = asyncio.get_running_loop()
+        txDone = asyncio.Event()
+
+        await self.aquire_lock_async()
+        previous = (self._frequency, self._spreading_factor)
+        try:
+            self.beginPacket(implicitHeader)
+            if channel is not None:
+                self.setChannel(*channel)
+            self.write(data)
+            airtime = self.time_on_air(self.readRegister(REG_PAYLOAD_LENGTH), implicitHeader,
+                                       self._spreading_factor)
+            deadline = loop.time() + (2 * airtime + 1 if timeout is None else timeout)
+
+            if self.pin_RxDone:
+                self._irq_listen(self.pin_RxDone, loop, txDone)
+                self.writeRegisters(((REG_DIO_MAPPING_1, DIO0_TX_DONE),
+                                     (REG_OP_MODE, MODE_LONG_RANGE_MODE | MODE_TX)))
+            else:
+                self.writeRegister(REG_OP_MODE, MODE_LONG_RANGE_MODE | MODE_TX)
+
+            while (self.readRegister(REG_IRQ_FLAGS) & IRQ_TX_DONE_MASK) == 0:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self.standby()
+                    raise TimeoutError('{}: no TX_DONE'.format(self.name))
+                if self.pin_RxDone:
+                    await wait_event(txDone, remaining)
+                else:
+                    await asyncio.sleep(min(airtime, remaining))
+
+            self.writeRegister(REG_IRQ_FLAGS, IRQ_TX_DONE_MASK)
+            self.invalidate_op_mode()
+        finally:
+            if self.pin_RxDone:
+                self._irq_unlisten(self.pin_RxDone, loop, txDone)
+                self.writeRegister(REG_DIO_MAPPING_1, DIO0_RX_DONE)
+            if channel is not None and (self._frequency, self._spreading_factor) != previous:
+                self.standby()
+                self.setChannel(*previous)
+            if self._rx_size is not None:
+                self.receive(self._rx_size)
+            self.aquire_lock(False)
+        return airtime
+
     def write(self, buffer):
         currentLength = self.readRegister(REG_PAYLOAD_LENGTH)
         size = len(buffer)
@@ -158,48 +371,141 @@ class SX127x:
         # check size
         size = min(size, (MAX_PKT_LENGTH - FifoTxBaseAddr - currentLength))
 
-        # write data
-        for i in range(size):
-            self.writeRegister(REG_FIFO, buffer[i])
+        # write data, burst write as the FIFO pointer auto-increments
+        if size > 0:
+            self.writeRegisterBurst(REG_FIFO, buffer[:size])
 
         # update length
         self.writeRegister(REG_PAYLOAD_LENGTH, currentLength + size)
         return size
 
-    def aquire_lock(self, lock=False):
-        # MicroPython is single threaded, doesn't need lock.
-        if not config_lora.IS_MICROPYTHON:
-            if lock:
-                while self._lock:
-                    pass
-                self._lock = True
-            else:
-                self._lock = False
-
-    def println(self, string, implicitHeader=False):
-        self.aquire_lock(True)  # wait until RX_Done, lock and begin writing.
-
-        self.beginPacket(implicitHeader)
-        self.write(string.encode('utf-8'))
-        self.endPacket()
-
-        self.aquire_lock(False)  # unlock when done writing
+    def aquire_lock(self, lock=False, timeout=-1):
+        # lock=True blocks (without spinning) until the lock is free or timeout
+        # seconds passed (-1: forever), returns whether it was acquired.
+        # lock=False releases it.
+        # On an event loop thread it never blocks: the holder may be a
+        # coroutine of that loop (transmit() holds the lock across await),
+        # which could not run to release it. Use aquire_lock_async() there.
+        if self._lock is None:
+            return True
+        if lock:
+            if on_event_loop():
+                return self._lock.acquire(False)
+            return self._lock.acquire(timeout=timeout)
+        self._lock.release()
+        return True
+
+    async def aquire_lock_async(self, timeout=None):
+        # asyncio variant of aquire_lock(True): when the lock is taken, wait
+        # for it in an executor thread so the event loop keeps running.
+        # Release with aquire_lock(False).
+        if self._lock is None or self._lock.acquire(blocking=False):
+            return True
+        future = asyncio.get_running_loop().run_in_executor(
+            None, self._lock.acquire, True, -1 if timeout is None else timeout)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # the executor thread may still get the lock, hand it back
+            future.add_done_callback(
+                lambda f: f.cancelled() or not f.result() or self._lock.release())
+            raise
+
+    def println(self, string, implicitHeader=False, timeout=-1):
+        # wait until RX_Done, lock and begin writing.
+        # Not for the event loop thread: there it raises TimeoutError at once
+        # when the radio is locked (see aquire_lock), use transmit() instead.
+        if not self.aquire_lock(True, timeout):
+            raise TimeoutError('{}: radio busy'.format(self.name))
+        try:
+            self.beginPacket(implicitHeader)
+            self.write(string.encode('utf-8'))
+            self.endPacket()
+        finally:
+            self.aquire_lock(False)  # unlock when done writing
 
     def getIrqFlags(self):
         irqFlags = self.readRegister(REG_IRQ_FLAGS)
-        self.writeRegister(REG_IRQ_FLAGS, irqFlags)
+        if irqFlags:
+            self.writeRegister(REG_IRQ_FLAGS, irqFlags)
+            if irqFlags & IRQ_MODE_CHANGE_MASK:
+                self.invalidate_op_mode()
         return irqFlags
 
+    def read_rx_irq(self):
+        # RX continuous: the IRQ flags, FIFO_RX_CURRENT_ADDR and RX_NB_BYTES
+        # read in one SPI transaction, then only the flags read are cleared,
+        # as in getIrqFlags(), and FIFO_RX_CURRENT_ADDR read again in a second
+        # one. A packet whose RxDone came after the flags were read keeps its
+        # flag, unless RxDone was set already: then it has moved
+        # FIFO_RX_CURRENT_ADDR, and is returned by the next call
+        # (rx_irq_pending() is true until then).
+        if self._rx_irq_next is not None:
+            irqFlags, current, rx_nb_bytes = self._rx_irq_next
+            self._rx_irq_next = None
+            return irqFlags, current, rx_nb_bytes
+        irqFlags, current, rx_nb_bytes = self.transfer_many(self.pin_ss, (
+            (REG_IRQ_FLAGS, 0x00), (REG_FIFO_RX_CURRENT_ADDR, 0x00), (REG_RX_NB_BYTES, 0x00)))
+        if irqFlags:
+            _, later, next_current, next_rx_nb_bytes = self.transfer_many(self.pin_ss, (
+                (REG_IRQ_FLAGS | 0x80, irqFlags), (REG_IRQ_FLAGS, 0x00),
+                (REG_FIFO_RX_CURRENT_ADDR, 0x00), (REG_RX_NB_BYTES, 0x00)))
+            if irqFlags & IRQ_RX_DONE_MASK and next_current != current:
+                # its RxDone was cleared with the one read
+                if later:
+                    self.writeRegister(REG_IRQ_FLAGS, later)
+                self._rx_irq_next = (later | IRQ_RX_DONE_MASK, next_current, next_rx_nb_bytes)
+            if (irqFlags | later) & IRQ_MODE_CHANGE_MASK:
+                self.invalidate_op_mode()
+        return irqFlags, current, rx_nb_bytes
+
+    def rx_irq_pending(self):
+        # whether read_rx_irq() has a packet to return without an interrupt
+        return self._rx_irq_next is not None
+
+    def invalidate_op_mode(self):
+        # the radio left RX / TX on its own, read REG_OP_MODE from the chip next time
+        if self._shadow is not None:
+            self._shadow.pop(REG_OP_MODE, None)
+
     def packetRssi(self):
         return (self.readRegister(REG_PKT_RSSI_VALUE) - (164 if self._frequency < 868E6 else 157))
 
     def packetSnr(self):
-        return (self.readRegister(REG_PKT_SNR_VALUE)) * 0.25
+        # two's complement, in 0.25 dB steps
+        snr = self.readRegister(REG_PKT_SNR_VALUE)
+        return (snr - 256 if snr & 0x80 else snr) * 0.25
+
+    def read_packet_info(self, payload=None, timestamp=None):
+        # link quality of the last packet, all status registers in one SPI burst
+        status = self.readRegisterBurst(REG_MODEM_STAT, PACKET_STATUS_LENGTH)
+
+        snr = status[REG_PKT_SNR_VALUE - REG_MODEM_STAT]
+        snr = (snr - 256 if snr & 0x80 else snr) * 0.25
+        rssi = status[REG_PKT_RSSI_VALUE - REG_MODEM_STAT] - (164 if self._frequency < 868E6 else 157)
+        if snr < 0:
+            # below the noise floor the packet RSSI needs the SNR (datasheet 5.5.5)
+            rssi += snr
+
+        # 20 bit two's complement frequency error, to Hz (datasheet 4.1.5)
+        fei = ((status[REG_FEI_MSB - REG_MODEM_STAT] & 0x0f) << 16) | \
+            (status[REG_FEI_MID - REG_MODEM_STAT] << 8) | status[REG_FEI_LSB - REG_MODEM_STAT]
+        if fei & 0x80000:
+            fei -= 0x100000
+        fei = fei * (1 << 24) / FXOSC * (self._signal_bandwidth / 500E3)
+
+        return PacketInfo(payload, rssi, snr, fei,
+                          crc=bool(status[REG_HOP_CHANNEL - REG_MODEM_STAT] & 0x40),
+                          coding_rate=4 + (status[0] >> 5),
+                          timestamp=monotonic() if timestamp is None else timestamp)
 
     def standby(self):
+        self._rx_armed = False
         self.writeRegister(REG_OP_MODE, MODE_LONG_RANGE_MODE | MODE_STDBY)
 
     def sleep(self):
+        self._rx_armed = False
+        self._rx_size = None
         self.writeRegister(REG_OP_MODE, MODE_LONG_RANGE_MODE | MODE_SLEEP)
 
     def setTxPower(self, level, outputPin=PA_OUTPUT_PA_BOOST_PIN):
@@ -215,7 +521,10 @@ class SX127x:
 
     def setFrequency(self, frequency):
         self._frequency = frequency
+        frf = self._frf(frequency)
+        self.writeRegisters(((REG_FRF_MSB, frf[0]), (REG_FRF_MID, frf[1]), (REG_FRF_LSB, frf[2])))
 
+    def _frf(self, frequency):
         frfs = {169E6: (42, 64, 0),
                 433E6: (108, 64, 0),
                 434E6: (108, 128, 0),
@@ -223,12 +532,36 @@ class SX127x:
                 868E6: (217, 0, 0),
                 915E6: (228, 192, 0)}
 
-        self.writeRegister(REG_FRF_MSB, frfs[frequency][0])
-        self.writeRegister(REG_FRF_MID, frfs[frequency][1])
-        self.writeRegister(REG_FRF_LSB, frfs[frequency][2])
+        if frequency in frfs:
+            frf = frfs[frequency]
+        else:
+            # any other channel, Frf = frequency * 2^19 / FXOSC
+            frf = int(frequency * (1 << 19) / FXOSC)
+            frf = (frf >> 16 & 0xff, frf >> 8 & 0xff, frf & 0xff)
+        return frf
+
+    def setChannel(self, frequency, sf, then=()):
+        # retune (in standby), e.g. while scanning; LowDataRateOptimize
+        # follows the symbol time as in init(). One SPI transaction reads the
+        # modem config, one writes the channel, followed by the (address,
+        # value) pairs of then, e.g. the mode to start on the new channel.
+        self._frequency = frequency
+        sf = self._spreading_factor = min(max(sf, 6), 12)
+        modem_config_2, modem_config_3 = self.readRegisters(REG_MODEM_CONFIG_2, REG_MODEM_CONFIG_3)
+        frf = self._frf(frequency)
+        pairs = [(REG_FRF_MSB, frf[0]), (REG_FRF_MID, frf[1]), (REG_FRF_LSB, frf[2]),
+                 (REG_DETECTION_OPTIMIZE, 0xc5 if sf == 6 else 0xc3),
+                 (REG_DETECTION_THRESHOLD, 0x0c if sf == 6 else 0x0a),
+                 (REG_MODEM_CONFIG_2, (modem_config_2 & 0x0f) | ((sf << 4) & 0xf0))]
+        ldro = 1000 / (self._signal_bandwidth / 2**sf) > 16
+        if ldro != self._ldro:
+            self._ldro = ldro
+            pairs.append((REG_MODEM_CONFIG_3, modem_config_3 | 0x08 if ldro else modem_config_3 & 0xf7))
+        pairs.extend(then)
+        self.writeRegisters(pairs)
 
     def setSpreadingFactor(self, sf):
-        sf = min(max(sf, 6), 12)
+        sf = self._spreading_factor = min(max(sf, 6), 12)
         self.writeRegister(REG_DETECTION_OPTIMIZE, 0xc5 if sf == 6 else 0xc3)
         self.writeRegister(REG_DETECTION_THRESHOLD, 0x0c if sf == 6 else 0x0a)
         self.writeRegister(REG_MODEM_CONFIG_2, (self.readRegister(
@@ -243,6 +576,7 @@ class SX127x:
             if sbw <= bins[i]:
                 bw = i
                 break
+        self._signal_bandwidth = bins[bw] if bw < len(bins) else 500E3
 
         # bw = bins.index(sbw)
 
@@ -296,15 +630,62 @@ class SX127x:
                 self.pin_RxDone.detach_irq()
 
     def receive(self, size=0):
-        self.implicitHeaderMode(size > 0)
-        if size > 0:
-            self.writeRegister(REG_PAYLOAD_LENGTH, size & 0xff)
+        self._set_rx_length(size)
 
         # The last packet always starts at FIFO_RX_CURRENT_ADDR
         # no need to reset FIFO_ADDR_PTR
+        if not self._rx_armed:
+            # entering RX, the demodulator writes from FifoRxBaseAddr on
+            self._fifo_rx_next = FifoRxBaseAddr
+            self._fifo_rx_last = None
+            self._rx_irq_next = None
+        self._rx_armed = True
+        self._rx_size = size
         self.writeRegister(
             REG_OP_MODE, MODE_LONG_RANGE_MODE | MODE_RX_CONTINUOUS)
 
+    def set_frame_length(self, size):
+        # switch the frames packets() and scan() receive: a fixed payload
+        # length of size bytes in implicit header mode, or 0 for explicit
+        # header frames of any length. Takes effect at once when receiving:
+        # the radio re-enters RX continuous, packets not read yet are dropped.
+        # Blocks while the radio is locked; on the event loop thread it raises
+        # TimeoutError instead, use set_frame_length_async() there.
+        if not self.aquire_lock(True):
+            raise TimeoutError('{}: radio busy'.format(self.name))
+        try:
+            self._switch_frame_length(size)
+        finally:
+            self.aquire_lock(False)
+
+    async def set_frame_length_async(self, size):
+        # set_frame_length() for coroutines, waits for a transmit() in progress
+        await self.aquire_lock_async()
+        try:
+            self._switch_frame_length(size)
+        finally:
+            self.aquire_lock(False)
+
+    def _switch_frame_length(self, size):
+        self.frame_length = self._check_rx_length(size)
+        if self._rx_size is not None:
+            self.standby()
+            # RxDone of a dropped packet must not be read with the new length
+            self.getIrqFlags()
+            self.receive(size)
+
+    def _check_rx_length(self, size):
+        if not 0 <= size <= MAX_PKT_LENGTH:
+            raise ValueError('{}: payload length {} not in 0..{}'.format(self.name, size, MAX_PKT_LENGTH))
+        return size
+
+    def _set_rx_length(self, size):
+        # implicit header mode with REG_PAYLOAD_LENGTH = size, explicit if 0
+        self.implicitHeaderMode(self._check_rx_length(size) > 0)
+        if size > 0:
+            self.writeRegister(REG_PAYLOAD_LENGTH, size)
+        self._rx_length = size
+
     # on RPi, interrupt callback is threaded and racing with main thread,
     # Needs a lock for accessing FIFO.
     # https://sourceforge.net/p/raspberry-gpio-python/wiki/Inputs/
@@ -312,23 +693,231 @@ class SX127x:
 
     def handleOnReceive(self, event_source):
         self.aquire_lock(True)              # lock until TX_Done
+        payload = None
+        try:
+            # irqFlags = self.getIrqFlags() should be 0x50
+            if (self.getIrqFlags() & IRQ_PAYLOAD_CRC_ERROR_MASK) == 0:
+                if self._onReceive:
+                    payload = self.read_payload()
+        finally:
+            self.aquire_lock(False)         # unlock when done reading
+
+        if payload is not None:
+            self._onReceive(self, payload)
+
+    async def packets(self, size=None, buffer=None, poll_interval=0.01, info=False):
+        # Async iterator over received payloads: async for payload in lora.packets()
+        # size: fixed payload length (implicit header), 0 for explicit header,
+        # None for self.frame_length.
+        # The radio stays in RX continuous mode and the DIO0 RxDone interrupt
+        # (RPi.GPIO callback thread) wakes the event loop through
+        # call_soon_threadsafe; the FIFO itself is read in the event loop thread.
+        # Without a DIO0 pin, the IRQ flags are polled every poll_interval seconds.
+        # If buffer is given it is reused and a memoryview of it is yielded,
+        # valid until the next packet (packets overtaken by a later one come
+        # as bytes); otherwise a bytes object is yielded.
+        # With info=True a PacketInfo wrapping the payload is yielded instead.
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+
+        if buffer is None:
+            buffer = bytearray(MAX_PKT_LENGTH)
+            copy = True
+        else:
+            copy = False
+        view = memoryview(buffer)
 
-        # irqFlags = self.getIrqFlags() should be 0x50
-        if (self.getIrqFlags() & IRQ_PAYLOAD_CRC_ERROR_MASK) == 0:
-            if self._onReceive:
-                payload = self.read_payload()
-                self.aquire_lock(False)     # unlock when done reading
-
-                self._onReceive(self, payload)
-
-        self.aquire_lock(False)             # unlock in any case.
+        if self.pin_RxDone:
+            self.writeRegister(REG_DIO_MAPPING_1, DIO0_RX_DONE)
+            self._irq_listen(self.pin_RxDone, loop, wakeup)
+        self.receive(self.frame_length if size is None else size)
+        try:
+            while True:
+                if self.pin_RxDone:
+                    await wakeup.wait()
+                    wakeup.clear()
+                else:
+                    await asyncio.sleep(poll_interval)
+                timestamp = monotonic()
+
+                # not held across yield, the consumer may transmit
+                await self.aquire_lock_async()
+                try:
+                    irqFlags, current, rx_nb_bytes = self.read_rx_irq()
+                    spans = self.pending_payloads(current, rx_nb_bytes) if irqFlags & IRQ_RX_DONE_MASK else []
+                    packet_info = None
+                    if spans and info:
+                        packet_info = self.read_packet_info(timestamp=timestamp)
+                    # the CRC error flag does not tell which packet it is
+                    # about when earlier ones were overtaken in the FIFO
+                    # (implicit header), so none of them is trusted
+                    if spans and irqFlags & IRQ_PAYLOAD_CRC_ERROR_MASK:
+                        spans = []
+                        packet_info = None
+                    # all read before the first yield: a transmit by the
+                    # consumer overwrites the FIFO from FifoTxBaseAddr
+                    payloads = []
+                    last = len(spans) - 1
+                    for i, (start, packetLength) in enumerate(spans):
+                        self.read_fifo_into(buffer, start, packetLength)
+                        payloads.append(view[:packetLength] if i == last and not copy
+                                        else bytes(view[:packetLength]))
+                finally:
+                    self.aquire_lock(False)
+                if self.rx_irq_pending():
+                    # a packet completed while this one was read, no DIO0 edge
+                    wakeup.set()
+                for i, payload in enumerate(payloads):
+                    if info:
+                        # the status registers describe the last packet only
+                        if i == last and packet_info is not None:
+                            packet_info.payload = payload
+                            payload = packet_info
+                        else:
+                            payload = PacketInfo(payload, timestamp=timestamp)
+                    yield payload
+                self.collect_garbage()
+        finally:
+            if self.pin_RxDone:
+                self._irq_unlisten(self.pin_RxDone, loop, wakeup)
+
+    async def scan(self, channels, buffer=None, info=True, poll_interval=0.001):
+        # CAD scanning receive: one radio listens on several channels, given as
+        # (frequency, spreading_factor) tuples. Each channel gets a channel
+        # activity detection (about two symbols long); only when it detects a
+        # preamble does the radio switch to RX single on that channel, which
+        # ends with RxDone or after the symbol timeout (REG_SYMB_TIMEOUT).
+        # CadDone comes from DIO3 (pin_CadDone), or from DIO0 remapped when DIO3
+        # is not wired; without IRQ pins the flags are polled. CadDetected is
+        # read from the IRQ flags once CadDone fired, so DIO4 is not needed.
+        # Yields (channel, PacketInfo), or (channel, payload) with info=False;
+        # the payload is as in packets(), of self.frame_length bytes if set.
+        loop = asyncio.get_running_loop()
+        cadDone = asyncio.Event()
+        rxDone = asyncio.Event()
+
+        if buffer is None:
+            buffer = bytearray(MAX_PKT_LENGTH)
+            copy = True
+        else:
+            copy = False
+        view = memoryview(buffer)
+
+        cad_pin = self.pin_CadDone or self.pin_RxDone
+        listeners = []
+        if cad_pin:
+            listeners.append((cad_pin, cadDone))
+        if self.pin_RxDone and self.pin_RxDone is not cad_pin:
+            listeners.append((self.pin_RxDone, rxDone))
+        if self.pin_RxTimeout:
+            listeners.append((self.pin_RxTimeout, rxDone))
+        for pin, event in listeners:
+            self._irq_listen(pin, loop, event)
+        rx_event = rxDone if self.pin_RxDone and self.pin_RxDone is not cad_pin else None
+        dio_mapping = DIO0_CAD_DONE if cad_pin is self.pin_RxDone else DIO0_RX_DONE
+
+        # not resumed by endPacket() / transmit() while scanning
+        self._rx_size = None
+        symbol_timeout = ((self.readRegister(REG_MODEM_CONFIG_2) & 0x03) << 8) | \
+            self.readRegister(REG_SYMB_TIMEOUT_LSB)
+        try:
+            while True:
+                for channel in channels:
+                    frequency, sf = channel
+                    symbol_time = 2**sf / self._signal_bandwidth
+                    packetLength = None
+
+                    # the lock is not held across yield, the consumer may transmit
+                    await self.aquire_lock_async()
+                    try:
+                        self.standby()
+                        cadDone.clear()
+                        self.setChannel(frequency, sf, ((REG_DIO_MAPPING_1, dio_mapping),
+                                                        (REG_OP_MODE, MODE_LONG_RANGE_MODE | MODE_CAD)))
+                        irqFlags = await self._wait_irq(
+                            cad_pin and cadDone, IRQ_CAD_DONE_MASK, 8 * symbol_time + 0.01, poll_interval)
+
+                        if irqFlags & IRQ_CAD_DETECTED_MASK:
+                            # preamble on this channel, receive the packet
+                            timestamp = monotonic()
+                            rxDone.clear()
+                            # header mode and length, also after a transmit
+                            self._set_rx_length(self.frame_length)
+                            self.writeRegisters(((REG_DIO_MAPPING_1, DIO0_RX_DONE),
+                                                 (REG_FIFO_ADDR_PTR, FifoRxBaseAddr),
+                                                 (REG_OP_MODE, MODE_LONG_RANGE_MODE | MODE_RX_SINGLE)))
+                            irqFlags = await self._wait_irq(
+                                rx_event, IRQ_RX_DONE_MASK | IRQ_RX_TIME_OUT_MASK,
+                                symbol_timeout * symbol_time + time_on_air(
+                                    MAX_PKT_LENGTH, dict(self.parameters, spreading_factor=sf)),
+                                poll_interval)
+                            if (irqFlags & IRQ_RX_DONE_MASK) and not (irqFlags & IRQ_PAYLOAD_CRC_ERROR_MASK):
+                                packet_info = self.read_packet_info(timestamp=timestamp) if info else None
+                                packetLength = self.read_payload_into(buffer)
+                    finally:
+                        self.aquire_lock(False)
+
+                    if packetLength is not None:
+                        payload = bytes(view[:packetLength]) if copy else view[:packetLength]
+                        if packet_info is not None:
+                            packet_info.payload = payload
+                            packet_info.channel = channel
+                            payload = packet_info
+                        yield channel, payload
+                    else:
+                        # let other tasks run between CAD cycles
+                        await asyncio.sleep(0)
+        finally:
+            for pin, event in listeners:
+                self._irq_unlisten(pin, loop, event)
+            self.standby()
+            self.setChannel(self.parameters['frequency'], self.parameters['spreading_factor'],
+                            ((REG_DIO_MAPPING_1, DIO0_RX_DONE),))
+
+    async def _wait_irq(self, event, mask, timeout, poll_interval):
+        # wait until one of the mask IRQ flags is set, woken by event (set by
+        # an IRQ pin handler) or polling when event is None.
+        # Returns the IRQ flags, cleared on the chip, or 0 after timeout seconds.
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            irqFlags = self.getIrqFlags()
+            if irqFlags & mask:
+                return irqFlags
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                self.standby()
+                return 0
+            if event:
+                await wait_event(event, remaining)
+            else:
+                await asyncio.sleep(min(poll_interval, remaining))
+
+    def _irq_listen(self, pin, loop, event):
+        # packets(), transmit() and scan() can wait on the same DIO pin; a
+        # single IRQ handler (RPi.GPIO callback thread) wakes all of them
+        events = self._irq_events.get(pin)
+        if not events:
+            events = self._irq_events[pin] = set()
+
+            def handleIrq(event_source):
+                for loop, event in tuple(events):
+                    loop.call_soon_threadsafe(event.set)
+            pin.set_handler_for_irq_on_rising_edge(handler=handleIrq)
+        events.add((loop, event))
+
+    def _irq_unlisten(self, pin, loop, event):
+        events = self._irq_events.get(pin)
+        if events is not None:
+            events.discard((loop, event))
+            if not events:
+                del self._irq_events[pin]
+                pin.detach_irq()
 
     def receivedPacket(self, size=0):
         irqFlags = self.getIrqFlags()
 
-        self.implicitHeaderMode(size > 0)
-        if size > 0:
-            self.writeRegister(REG_PAYLOAD_LENGTH, size & 0xff)
+        self._set_rx_length(size)
 
         # if (irqFlags & IRQ_RX_DONE_MASK) and \
           # (irqFlags & IRQ_RX_TIME_OUT_MASK == 0) and \
@@ -345,32 +934,233 @@ class SX127x:
             self.writeRegister(
                 REG_OP_MODE, MODE_LONG_RANGE_MODE | MODE_RX_SINGLE)
 
-    def read_payload(self):
+    def read_payload(self, info=False):
+        # with a buffer pool: a memoryview of a pooled buffer, hand it back
+        # with buffer_pool.release() once done; otherwise a bytes copy.
+        # info=True wraps it in a PacketInfo with the packet's link quality.
+        packet_info = self.read_packet_info() if info else None
+        if self.buffer_pool is not None:
+            payload = self.buffer_pool.acquire()
+            packetLength = self.read_payload_into(payload)
+            payload = memoryview(payload)[:packetLength]
+        else:
+            packetLength = self.read_payload_into(self._payload_buffer)
+            payload = bytes(memoryview(self._payload_buffer)[:packetLength])
+        if packet_info is None:
+            return payload
+        packet_info.payload = payload
+        return packet_info
+
+    def read_payload_into(self, buffer):
+        # fill a preallocated buffer (at least MAX_PKT_LENGTH bytes) with the
+        # received packet and return its length, so the caller can reuse it.
+
         # set FIFO address to current RX address
-        # fifo_rx_current_addr = self.readRegister(REG_FIFO_RX_CURRENT_ADDR)
-        self.writeRegister(REG_FIFO_ADDR_PTR,
-                           self.readRegister(REG_FIFO_RX_CURRENT_ADDR))
+        fifo_rx_current_addr = self.readRegister(REG_FIFO_RX_CURRENT_ADDR)
 
-        # read packet length
-        packetLength = self.readRegister(REG_PAYLOAD_LENGTH) if self._implicitHeaderMode else \
-            self.readRegister(REG_RX_NB_BYTES)
+        packetLength = self.packet_length()
+        self._fifo_rx_last = fifo_rx_current_addr
+        self._fifo_rx_next = (fifo_rx_current_addr + packetLength) % FIFO_SIZE
 
-        payload = bytearray()
-        for i in range(packetLength):
-            payload.append(self.readRegister(REG_FIFO))
+        self.read_fifo_into(buffer, fifo_rx_current_addr, packetLength)
 
         self.collect_garbage()
-        return bytes(payload)
+        return packetLength
+
+    def pending_payloads(self, current=None, rx_nb_bytes=None):
+        # RX continuous: (start, length) of every packet received since the
+        # last call, oldest first. Packets are written back to back, so when
+        # another packet arrived before the previous RxDone was serviced,
+        # FIFO_RX_CURRENT_ADDR has moved past it and the bytes in between are
+        # the overtaken packet(s). With a fixed payload length (implicit
+        # header) they are split per packet. With explicit headers their
+        # lengths are lost, so the bytes are dropped (and counted in
+        # rx_overruns / rx_dropped_bytes) rather than returned merged.
+        # current and rx_nb_bytes: the registers, if already read.
+        if current is None:
+            current = self.readRegister(REG_FIFO_RX_CURRENT_ADDR)
+        if current == self._fifo_rx_last:
+            # RxDone of a packet already read
+            return []
+        packetLength = self.packet_length(rx_nb_bytes)
+
+        spans = []
+        start = self._fifo_rx_next
+        missed = (current - start) % FIFO_SIZE
+        if self._implicitHeaderMode and packetLength:
+            while missed >= packetLength:
+                spans.append((start, packetLength))
+                start = (start + packetLength) % FIFO_SIZE
+                missed -= packetLength
+        if missed:
+            self.rx_overruns += 1
+            self.rx_dropped_bytes += missed
+        spans.append((current, packetLength))
+
+        self._fifo_rx_last = current
+        self._fifo_rx_next = (current + packetLength) % FIFO_SIZE
+        return spans
+
+    def packet_length(self, rx_nb_bytes=None):
+        # length of the last received packet. In implicit header mode it is
+        # the one set for RX, without an SPI read: REG_PAYLOAD_LENGTH holds
+        # the length of the last frame sent once the radio transmitted.
+        if self._implicitHeaderMode and self._rx_length:
+            return self._rx_length
+        return self.readRegister(REG_RX_NB_BYTES) if rx_nb_bytes is None else rx_nb_bytes
+
+    def read_fifo_into(self, buffer, start, length):
+        # burst read, the FIFO pointer auto-increments; split where it wraps
+        first = min(length, FIFO_SIZE - start)
+        self.writeRegister(REG_FIFO_ADDR_PTR, start)
+        buffer[:first] = self.readRegisterBurst(REG_FIFO, first)
+        if first < length:
+            self.writeRegister(REG_FIFO_ADDR_PTR, 0)
+            buffer[first:length] = self.readRegisterBurst(REG_FIFO, length - first)
+        return length
 
     def readRegister(self, address, byteorder='big', signed=False):
+        if self._shadow is not None:
+            value = self._shadow.get(address)
+            if value is not None:
+                return value
         response = self.transfer(self.pin_ss, address & 0x7f)
-        return int.from_bytes(response, byteorder)
+        value = int.from_bytes(response, byteorder)
+        if self._shadow is not None and address in SHADOWED_REGISTERS:
+            self._shadow[address] = value
+        return value
 
     def writeRegister(self, address, value):
         self.transfer(self.pin_ss, address | 0x80, value)
+        if self._shadow is not None and address in SHADOWED_REGISTERS:
+            self._shadow[address] = value
+
+    def readRegisterBurst(self, address, length):
+        return self.transfer_burst(self.pin_ss, address & 0x7f, bytes(length))
+
+    def writeRegisterBurst(self, address, values):
+        self.transfer_burst(self.pin_ss, address | 0x80, values)
+
+    def readRegisters(self, *addresses):
+        # values of several registers, read in one SPI transaction (the
+        # controller's transfer_many); shadowed ones are not read again
+        shadow = self._shadow
+        if shadow is None:
+            return list(self.transfer_many(self.pin_ss, [(address & 0x7f, 0x00) for address in addresses]))
+        values = [shadow.get(address) for address in addresses]
+        missing = [address for address, value in zip(addresses, values) if value is None]
+        if missing:
+            read = iter(self.transfer_many(self.pin_ss, [(address & 0x7f, 0x00) for address in missing]))
+            for i, address in enumerate(addresses):
+                if values[i] is None:
+                    values[i] = next(read)
+                    if address in SHADOWED_REGISTERS:
+                        shadow[address] = values[i]
+        return values
+
+    def writeRegisters(self, pairs):
+        # (address, value) pairs written in order, in one SPI transaction
+        self.transfer_many(self.pin_ss, [(address | 0x80, value) for address, value in pairs])
+        if self._shadow is not None:
+            for address, value in pairs:
+                if address in SHADOWED_REGISTERS:
+                    self._shadow[address] = value
+
+    def set_gc_policy(self, policy=None, interval=10, thresholds=None):
+        # When collect_garbage() (called per packet) collects:
+        #   'always':       gc.collect() every time, default on MicroPython
+        #   'none':         never, the interpreter's automatic collection
+        #                   does it, default on CPython
+        #   'generational': never, tune the automatic collection with
+        #                   thresholds (gc.set_threshold) and move the
+        #                   objects alive at this point out of it (gc.freeze)
+        #   'periodic':     automatic collection off, a full collection at
+        #                   most every interval seconds
+        # gc settings are process wide, the last policy set wins.
+        if policy is None:
+            policy = GC_ALWAYS if config_lora.IS_MICROPYTHON else GC_NONE
+        if policy not in GC_POLICIES:
+            raise ValueError('Invalid GC policy: {}'.format(policy))
+
+        self._gc_policy = policy
+        self._gc_interval = interval
+        self._gc_last = monotonic()
+
+        if config_lora.IS_MICROPYTHON:
+            return
+        if policy == GC_PERIODIC:
+            gc.disable()
+        else:
+            gc.enable()
+        if policy == GC_GENERATIONAL:
+            if thresholds:
+                gc.set_threshold(*thresholds)
+            if hasattr(gc, 'freeze'):
+                gc.freeze()
 
     def collect_garbage(self):
+        if self._gc_policy == GC_PERIODIC:
+            if monotonic() - self._gc_last < self._gc_interval:
+                return
+            self._gc_last = monotonic()
+        elif self._gc_policy != GC_ALWAYS:
+            return
+
         gc.collect()
         if config_lora.IS_MICROPYTHON:
             print(
                 '[Memory - free: {}   allocated: {}]'.format(gc.mem_free(), gc.mem_alloc()))
+
+
+class PacketInfo:
+
+    # A received packet and its link quality: RSSI (dBm), SNR (dB), frequency
+    # error (Hz), whether the header announced a payload CRC, the header coding
+    # rate denominator, when it was received (monotonic seconds), and the
+    # (frequency, spreading_factor) it was received on by scan().
+    # Fields are None when unknown.
+
+    __slots__ = ('payload', 'rssi', 'snr', 'fei', 'crc', 'coding_rate', 'timestamp', 'channel')
+
+    def __init__(self, payload, rssi=None, snr=None, fei=None, crc=None,
+                 coding_rate=None, timestamp=None, channel=None):
+        self.payload = payload
+        self.rssi = rssi
+        self.snr = snr
+        self.fei = fei
+        self.crc = crc
+        self.coding_rate = coding_rate
+        self.timestamp = timestamp
+        self.channel = channel
+
+    def __repr__(self):
+        return 'PacketInfo({} bytes, rssi={}, snr={}, fei={}, crc={}, cr=4/{}, t={}, channel={})'.format(
+            len(self.payload) if self.payload is not None else None, self.rssi,
+            self.snr, self.fei, self.crc, self.coding_rate, self.timestamp, self.channel)
+
+
+class PayloadBufferPool:
+
+    # Reusable payload buffers of MAX_PKT_LENGTH bytes, so receiving does
+    # not allocate a new bytearray per packet. acquire() hands out a free
+    # buffer (a new one when the pool is empty), release() takes it back, up
+    # to count buffers are kept. A smaller buffer would be grown by
+    # read_fifo_into() for a longer packet, and then not taken back.
+
+    def __init__(self, count=8):
+        self.count = count
+        self.size = MAX_PKT_LENGTH
+        self._free = [bytearray(self.size) for _ in range(count)]
+
+    def acquire(self):
+        try:
+            return self._free.pop()
+        except IndexError:
+            return bytearray(self.size)
+
+    def release(self, buffer):
+        # buffer: a bytearray from acquire(), or a memoryview of one
+        if isinstance(buffer, memoryview):
+            buffer = buffer.obj
+        if len(self._free) < self.count and len(buffer) == self.size:
+            self._free.append(buffer)
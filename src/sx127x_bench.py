@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark of the SX127x driver on the emulated controller, no radio needed.
+Usage: python -m src.sx127x_bench [packets]
+Receives packets through SX127x.packets() (DIO0 interrupt driven) and sends
+frames through SX127x.transmit(), with the emulated time on air set to zero,
+and prints per packet latency, SPI transactions and throughput as JSON.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+# no radio hardware, before config_lora is imported (by sx127x)
+os.environ.setdefault('LORA_CONTROLLER', 'emulated')
+
+from . import sx127x
+from .controller_emulated import Controller
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def summary(latencies, transactions, count, elapsed):
+    return {"packets": count,
+            "packets_per_s": round(count / elapsed),
+            "latency_us_p50": round(percentile(latencies, 0.5) * 1e6, 1),
+            "latency_us_p99": round(percentile(latencies, 0.99) * 1e6, 1),
+            "spi_transactions_per_packet": round(transactions / count, 2)}
+
+
+async def bench_receive(controller, lora, count, size, info):
+    # inject -> yielded by packets(): IRQ thread, event loop wakeup, FIFO read
+    radio = controller.radio(lora.name)
+    payload = bytes(range(size))
+    buffer = bytearray(sx127x.MAX_PKT_LENGTH)
+    latencies = []
+    packets = lora.packets(buffer=buffer, info=info)
+    receiving = asyncio.ensure_future(packets.__anext__())
+    await asyncio.sleep(0.01)
+
+    transactions = controller.spi_bus.transactions
+    start = time.perf_counter()
+    for _ in range(count):
+        sent = time.perf_counter()
+        radio.inject(payload, rssi=-90, snr=-2.5)
+        packet = await receiving
+        latencies.append(time.perf_counter() - sent)
+        assert len(packet.payload if info else packet) == size
+        receiving = asyncio.ensure_future(packets.__anext__())
+    elapsed = time.perf_counter() - start
+    transactions = controller.spi_bus.transactions - transactions
+
+    receiving.cancel()
+    await packets.aclose()
+    return summary(latencies, transactions, count, elapsed)
+
+
+async def bench_transmit(controller, lora, count, size):
+    # transmit(): FIFO fill, TX, DIO0 TxDone wakeup, back to standby
+    payload = bytes(range(size))
+    latencies = []
+    transactions = controller.spi_bus.transactions
+    start = time.perf_counter()
+    for _ in range(count):
+        sent = time.perf_counter()
+        await lora.transmit(payload)
+        latencies.append(time.perf_counter() - sent)
+    elapsed = time.perf_counter() - start
+    transactions = controller.spi_bus.transactions - transactions
+    return summary(latencies, transactions, count, elapsed)
+
+
+async def benchmark(count, sizes=(16, 64, 255)):
+    controller = Controller(time_scale=0)
+    lora = controller.add_transceiver(sx127x.SX127x(name='LoRa'),
+                                      pin_id_ss=Controller.PIN_ID_FOR_LORA_SS,
+                                      pin_id_RxDone=Controller.PIN_ID_FOR_LORA_DIO0)
+    results = {}
+    for size in sizes:
+        results["receive/{}".format(size)] = await bench_receive(controller, lora, count, size, False)
+        results["receive_info/{}".format(size)] = await bench_receive(controller, lora, count, size, True)
+        results["transmit/{}".format(size)] = await bench_transmit(controller, lora, count, size)
+    return results
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    print(json.dumps({"packets": count,
+                      "results": asyncio.run(benchmark(count))}, indent=2))
@@ -0,0 +1,79 @@
+import asyncio
+from collections import deque
+
+
+# Downlink / ack queue: frames are sent one at a time by a background task,
+# so callers never wait for the radio. Each frame's time on air is estimated
+# from the transceiver parameters and charged against a duty-cycle budget
+# over a sliding window (e.g. 1% per hour in the EU868 g sub-bands); a frame
+# that does not fit waits until enough airtime has left the window.
+
+class TransmitQueue:
+
+    def __init__(self, lora, duty_cycle=0.01, window=3600, timeout=None):
+        self.lora = lora
+        self.duty_cycle = duty_cycle
+        self.window = window
+        self.timeout = timeout
+        self._queue = asyncio.Queue()
+        self._sent = deque()        # (end time, airtime) of recent frames
+        self._task = None
+
+    def budget(self):
+        # airtime allowed per window, in seconds
+        return self.duty_cycle * self.window
+
+    def airtime_used(self, now=None):
+        # airtime spent within the current window, in seconds
+        if now is None:
+            now = asyncio.get_running_loop().time()
+        while self._sent and self._sent[0][0] <= now - self.window:
+            self._sent.popleft()
+        return sum(airtime for _, airtime in self._sent)
+
+    def send(self, data, implicitHeader=False, channel=None):
+        # queue one frame (bytes or str), returns a future resolved with its
+        # time on air once TX_DONE, or with the transmit error; channel:
+        # (frequency, spreading_factor) to send on, default the radio's
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        airtime = self.lora.time_on_air(len(data), implicitHeader, channel and channel[1])
+        if airtime > self.budget():
+            future.set_exception(ValueError(
+                'frame needs {:.3f}s on air, budget is {:.3f}s'.format(airtime, self.budget())))
+            return future
+        self._queue.put_nowait((bytes(data), implicitHeader, channel, airtime, future))
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        return future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            data, implicitHeader, channel, airtime, future = await self._queue.get()
+            if future.cancelled():
+                continue
+
+            # wait for the oldest frames to leave the window
+            while self.airtime_used() + airtime > self.budget():
+                await asyncio.sleep(self._sent[0][0] + self.window - loop.time())
+
+            try:
+                airtime = await self.lora.transmit(data, implicitHeader, self.timeout, channel)
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            else:
+                if not future.cancelled():
+                    future.set_result(airtime)
+            # a failed transmit may still have been on air
+            self._sent.append((loop.time(), airtime))
+
+    def close(self):
+        if self._task:
+            self._task.cancel()
+        while not self._queue.empty():
+            _, _, _, _, future = self._queue.get_nowait()
+            future.cancel()